@@ -0,0 +1,190 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2 as cv
+
+from poollib.Table import Table
+from poollib.instrument import quiet, profile
+from poollib.Archive import Archive, ball_rows, shot_rows
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".heic", ".heif")
+
+# Images collected before their results are appended to the archive (--archive)
+ARCHIVE_CHUNK = 256
+
+# Terminal color codes of the console messages (e.g. normalize errors), removed from JSON error strings
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def ball_to_dict(ball):
+    x, y = ball.get_coordinates()
+    return {"x": x, "y": y, "type": ball.get_type(), "color": ball.get_color()}
+
+
+def shot_to_dict(shot):
+    target_dir, white_dir = shot.get_lines()
+    return {
+        "target": [list(map(list, target_dir[key])) for key in sorted(target_dir)],
+        "white": [list(map(list, white_dir[key])) for key in sorted(white_dir)],
+        "ghost": list(shot.get_ghost()),
+        "angle": shot.get_angle(),
+        "length": round(shot.get_length(), 2),
+    }
+
+
+def analyze(path, raw=False, shot_type="all", cache_dir=None, pyramid=False, stages=False, memory=False,
+            profile_dir=None, archive=False):
+    """
+    Runs the full Table pipeline on one image.
+    path      - image path, or encoded image bytes (reported as image None)
+    raw       - transform and normalize first (raw phone photos)
+    shot_type - ball type to calculate shots for ("all", "stripe", "solid", "black")
+    cache_dir - directory of cached detection results (None = no cache)
+    pyramid   - coarse-to-fine ball detection (faster, see Table.detect)
+    stages    - add per-stage timing and counts to the result ("stages")
+    memory    - add the tracemalloc peak of every stage (implies stages)
+    profile_dir - write a cProfile stats file per image to this directory
+    archive   - add the balls and valid shots as archive rows ("archive": (balls, shots), see Archive);
+                NumPy arrays, so the caller removes them before writing JSON
+    returns a JSON-ready dict; errors are reported in it instead of being raised
+    """
+    result = {"image": path if isinstance(path, str) else None}
+    records = [] if stages or memory else None
+    start = time.perf_counter()
+
+    try:
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+            name = os.path.basename(path) if isinstance(path, str) else f"{os.getpid()}-{time.time_ns()}"
+            profiling = profile(os.path.join(profile_dir, name + ".prof"))
+        else:
+            profiling = contextlib.nullcontext()
+
+        # Progress printing is not needed per image in batch mode
+        with quiet(), profiling:
+            table = Table(path, cache_dir, sink=records.append if records is not None else None, memory=memory)
+            if raw:
+                table.transform()
+                table.normalize()
+            table.detect(pyramid)
+            table.categorize_balls()
+            table.calculate_shots(shot_type)
+            table.validate_shots()
+            valid_shots = table.get_shots()
+            valid_batch = table.get_shot_batch()
+            table.calculate_best_shots()
+
+        result["balls"] = [ball_to_dict(ball) for ball in table.get_balls()]
+        result["valid_shots"] = [shot_to_dict(shot) for shot in valid_shots]
+        result["best_shots"] = [shot_to_dict(shot) for shot in table.get_shots()]
+        if archive:
+            result["archive"] = (ball_rows(table.get_ball_set()), shot_rows(valid_batch))
+        result["error"] = None
+    except Exception as error:
+        result["error"] = ANSI_ESCAPE.sub("", str(error))
+
+    result["time"] = round(time.perf_counter() - start, 3)
+    if records is not None:
+        for record in records:
+            record.pop("table")
+            record["seconds"] = round(record["seconds"], 4)
+        result["stages"] = records
+    return result
+
+
+def _analyze_job(job):
+    return analyze(*job)
+
+
+def _init_worker():
+    # One OpenCV thread per process, parallelism comes from the pool
+    cv.setNumThreads(1)
+
+
+def find_images(inputs):
+    """Expands directories and glob patterns into a sorted list of image paths"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = [os.path.join(item, name) for name in os.listdir(item)]
+        else:
+            matches = glob.glob(item)
+        paths.extend(p for p in matches if p.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(p))
+    return sorted(set(paths))
+
+
+def run(paths, output, workers=None, raw=False, shot_type="all", cache_dir=None, pyramid=False,
+        stages=False, memory=False, profile_dir=None, archive_dir=None):
+    """
+    Analyzes images in a process pool and writes one JSON line per image as results arrive.
+    archive_dir - also append the balls and valid shots of every analyzed image to an Archive
+                  in this directory, ARCHIVE_CHUNK images per append
+    returns the number of images that failed
+    """
+    failed = 0
+    archive = Archive(archive_dir) if archive_dir is not None else None
+    pending = []
+    jobs = [(path, raw, shot_type, cache_dir, pyramid, stages, memory, profile_dir, archive is not None)
+            for path in paths]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        for result in executor.map(_analyze_job, jobs):
+            rows = result.pop("archive", None)
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            if result["error"]:
+                failed += 1
+            if rows is not None:
+                pending.append((os.path.basename(result["image"]), *rows))
+            if len(pending) >= ARCHIVE_CHUNK:
+                _append(archive, archive_dir, pending)
+                pending = []
+
+    if pending:
+        _append(archive, archive_dir, pending)
+    return failed
+
+
+# Appends collected rows to the archive; its progress message goes to stderr, stdout is the JSONL stream
+def _append(archive, archive_dir, pending):
+    with quiet():
+        frames = archive.append_rows(*zip(*pending))
+    print(f"[ARCHIVE] {len(frames)} frames appended to {archive_dir}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze many table photos, one JSON line per image")
+    parser.add_argument("inputs", nargs="+", help="image directories, files or glob patterns")
+    parser.add_argument("-o", "--output", help="JSONL output file (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--raw", action="store_true", help="transform and normalize raw photos first")
+    parser.add_argument("--type", default="all", choices=["all", "stripe", "solid", "black"],
+                        help="ball type to calculate shots for")
+    parser.add_argument("--cache", metavar="DIR", help="reuse detection results cached in DIR")
+    parser.add_argument("--pyramid", action="store_true", help="coarse-to-fine (faster) ball detection")
+    parser.add_argument("--stages", action="store_true", help="add per-stage timing and counts to each result")
+    parser.add_argument("--memory", action="store_true", help="add per-stage tracemalloc peaks (slower)")
+    parser.add_argument("--profile", metavar="DIR", help="write a cProfile stats file per image to DIR")
+    parser.add_argument("--archive", metavar="DIR", help="append balls and valid shots to a columnar archive in DIR")
+    args = parser.parse_args()
+
+    paths = find_images(args.inputs)
+    start = time.perf_counter()
+
+    with (open(args.output, "w", encoding="utf-8") if args.output else contextlib.nullcontext(sys.stdout)) as output:
+        failed = run(paths, output, args.workers, args.raw, args.type, args.cache, args.pyramid,
+                     args.stages, args.memory, args.profile, args.archive)
+
+    elapsed = time.perf_counter() - start
+    print(f"Analyzed {len(paths)} images ({failed} failed) in {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+import sys
+import json
+import time
+import argparse
+
+import cv2 as cv
+import numpy as np
+
+from poollib.synthetic import synthetic_table, BALL_RADIUS
+from poollib.detect import detect_balls
+from poollib.categorize import categorize, categorize_batch, BATCH_PARAMS
+from poollib.shots_batch import get_shots_batch, get_rail_shots_batch, validate_batch, take_shots, batch_to_shots
+from poollib.shots_calculations import get_shots, is_shot_blocked, is_edge_possible, rank_shots
+from poollib.Ball import Ball
+from poollib.ShotSet import ShotSet
+from poollib.TableIndex import TableIndex
+from poollib.instrument import quiet
+
+STAGES = ("detect_balls", "categorize", "get_shots", "validate_shots", "get_best_shots")
+
+# Detected centre further than this from the true one counts as a miss
+MATCH_TOLERANCE = 5
+
+
+def timed(function, repeat):
+    """
+    Runs function repeat times.
+    returns (list of wall times in seconds, result of the last run)
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def match_balls(truth, found):
+    """
+    Pairs every true ball with the nearest detected centre.
+    truth, found - centres (T, 2) and (F, 2)
+    returns (index of the detected ball or -1 per true ball, distance per true ball)
+    """
+    if len(found) == 0:
+        return np.full(len(truth), -1), np.full(len(truth), np.inf)
+    distances = np.hypot(*(truth[:, None] - found[None]).transpose(2, 0, 1))
+    nearest = distances.argmin(axis=1)
+    error = distances[np.arange(len(truth)), nearest]
+    return np.where(error <= MATCH_TOLERANCE, nearest, -1), error
+
+
+def bench_table(img, truth, repeat, cushions=None):
+    """
+    Times every stage on one synthetic table and checks detection and categorization
+    against the true layout. Shot stages use the true layout, so their timings do not
+    depend on detection errors.
+    cushions - time multi-cushion shots (get_rail_shots_batch) instead of one-cushion shots
+    returns ({stage: list of seconds}, accuracy dict)
+    """
+    times = {}
+    times["detect_balls"], (circles, masked) = timed(lambda: detect_balls(img), repeat)
+    found = np.zeros((0, 2), dtype=np.int64) if circles is None else np.round(circles[0, :, :2]).astype(np.int64)
+    times["categorize"], categories = timed(lambda: categorize_batch(found, masked, **BATCH_PARAMS), repeat)
+
+    centers = truth.get_centers()
+    types = truth.get_types()
+    white = centers[types.index("white")]
+    targets = centers[[i for i, ball_type in enumerate(types) if ball_type != "white"]]
+    if cushions is None:
+        times["get_shots"], batch = timed(lambda: get_shots_batch(white, targets), repeat)
+    else:
+        times["get_shots"], batch = timed(lambda: get_rail_shots_batch(white, targets, cushions), repeat)
+    # Table builds its index once per detection and validates every shot batch with it
+    index = TableIndex(centers, BALL_RADIUS)
+    times["validate_shots"], (valid, _) = timed(lambda: validate_batch(batch, centers, BALL_RADIUS, index=index),
+                                                repeat)
+    shots = take_shots(batch, valid)
+    banks = ShotSet(shots).get_banks()
+    times["get_best_shots"], _ = timed(lambda: rank_shots(shots["angle"], shots["length"], banks), repeat)
+
+    matched, error = match_balls(centers, found)
+    hits = matched >= 0
+    found_types = [categories[i][0] for i in matched[hits].tolist()]
+    true_types = [ball_type for ball_type, hit in zip(types, hits.tolist()) if hit]
+    accuracy = {
+        "balls": len(centers),
+        "detected": len(found),
+        "matched": int(hits.sum()),
+        "max_error": float(error[hits].max()) if hits.any() else None,
+        "types_correct": sum(a == b for a, b in zip(found_types, true_types)),
+        "shots": len(batch["angle"]),
+        "valid_shots": int(valid.sum()),
+    }
+    return times, accuracy
+
+
+def run(ball_counts, tables, repeat, noise, lighting, cushions=None):
+    """
+    Benchmarks every ball count on `tables` synthetic tables (seeds 0..tables-1).
+    returns a list of JSON-ready result dicts, one per ball count
+    """
+    results = []
+    for n_balls in ball_counts:
+        times = {stage: [] for stage in STAGES}
+        totals = {}
+        for seed in range(tables):
+            img, truth = synthetic_table(n_balls, seed, noise, lighting)
+            table_times, accuracy = bench_table(img, truth, repeat, cushions)
+            for stage in STAGES:
+                times[stage].extend(table_times[stage])
+            for key, value in accuracy.items():
+                if key == "max_error":
+                    totals[key] = max(totals.get(key) or 0, value or 0)
+                else:
+                    totals[key] = totals.get(key, 0) + value
+
+        results.append({
+            "balls": n_balls,
+            "tables": tables,
+            "ms": {stage: {"median": round(float(np.median(times[stage])) * 1000, 3),
+                           "min": round(float(np.min(times[stage])) * 1000, 3)} for stage in STAGES},
+            "recall": totals["matched"] / totals["balls"],
+            "precision": totals["matched"] / max(totals["detected"], 1),
+            "max_error": totals["max_error"],
+            "type_accuracy": totals["types_correct"] / max(totals["matched"], 1),
+            "shots": totals["shots"] / tables,
+            "valid_shots": totals["valid_shots"] / tables,
+        })
+    return results
+
+
+def check_categorize(found, masked):
+    """
+    Compares the batched classifier with categorize(), the one-KMeans-per-ball reference.
+    returns a list of mismatch descriptions (empty when every ball gets the same type and color)
+    """
+    batched = categorize_batch(found, masked, **BATCH_PARAMS)
+    mismatches = []
+    for (x, y), result in zip(found.tolist(), batched):
+        expected = categorize(x, y, masked)
+        if tuple(result) != tuple(expected):
+            mismatches.append(f"categorize at ({x}, {y}): {result} != {expected}")
+    return mismatches
+
+
+def scalar_valid(shot, balls):
+    """
+    Validity of one shot as the scalar Table.validate_shots decided it: playable angle and every
+    line clear of the other balls and starting outside the pocket zones.
+    balls - list of Balls
+    """
+    target_dir, white_dir = shot.get_lines()
+    lines = [target_dir.get("y1"), white_dir.get("y1"), target_dir.get("y2"), white_dir.get("y2")]
+    lines = [line for line in lines if line]
+    return (shot.get_angle() > 120 and not any(is_shot_blocked(line, balls, BALL_RADIUS) for line in lines)
+            and all(is_edge_possible(line) for line in lines))
+
+
+def check_shots(centers, types):
+    """
+    Compares the batched shot engine with the scalar one of Table.calculate_shots and validate_shots:
+    get_shots for every target, then is_shot_blocked and is_edge_possible for every line.
+    Lines, ghosts, angles, lengths and validity (with and without a TableIndex) must match exactly.
+    returns a list of mismatch descriptions
+    """
+    balls = [Ball(x, y) for x, y in centers.tolist()]
+    white = types.index("white")
+    targets = [i for i, ball_type in enumerate(types) if ball_type != "white"]
+    batch = get_shots_batch(centers[white], centers[targets])
+    shots = batch_to_shots(batch)
+    valid, _ = validate_batch(batch, centers, BALL_RADIUS)
+    valid_index, _ = validate_batch(batch, centers, BALL_RADIUS, index=TableIndex(centers, BALL_RADIUS))
+
+    mismatches = []
+    per_target = len(shots) // max(len(targets), 1)
+    for k, target in enumerate(targets):
+        rows = range(k * per_target, (k + 1) * per_target)
+        try:
+            expected = get_shots(balls[white], balls[target])
+        except ZeroDivisionError:
+            # A kick whose cushion point lies on the ghost ball has no direction; get_shots fails
+            # on it, the batch gives it a NaN angle so it can never be valid
+            degenerate = ~np.isfinite(batch["angle"][rows])
+            if not degenerate.any() or (valid[rows] | valid_index[rows])[degenerate].any():
+                mismatches.append(f"target {target}: get_shots fails but no invalid NaN angle in the batch")
+            continue
+        if len(expected) != per_target:
+            return [f"shots per target: {per_target} != {len(expected)}"]
+        mismatches += compare_shots(rows, shots, expected, valid, valid_index, balls)
+    return mismatches
+
+
+def compare_shots(rows, shots, expected, valid, valid_index, balls):
+    """
+    Compares rows of a batch (Shot views) with the scalar Shots of the same target.
+    returns a list of mismatch descriptions
+    """
+    mismatches = []
+    for i, reference in zip(rows, expected):
+        shot = shots[i]
+        for getter in ("get_lines", "get_ghost", "get_angle", "get_length"):
+            if getattr(shot, getter)() != getattr(reference, getter)():
+                mismatches.append(f"shot {i} {getter}: {getattr(shot, getter)()} != {getattr(reference, getter)()}")
+        reference_valid = scalar_valid(reference, balls)
+        if valid[i] != reference_valid or valid_index[i] != reference_valid:
+            mismatches.append(f"shot {i} valid: {bool(valid[i])} / {bool(valid_index[i])} (index) != {reference_valid}")
+    return mismatches
+
+
+def check(ball_counts, tables, noise, lighting):
+    """
+    Runs the equivalence checks of the batched stages on the synthetic tables.
+    returns (number of checked tables, list of mismatch descriptions)
+    """
+    mismatches = []
+    checked = 0
+    for n_balls in ball_counts:
+        for seed in range(tables):
+            img, truth = synthetic_table(n_balls, seed, noise, lighting)
+            if "white" in truth.get_types():
+                mismatches += [f"{n_balls} balls, seed {seed}, {m}"
+                               for m in check_shots(truth.get_centers(), truth.get_types())]
+            circles, masked = detect_balls(img)
+            if circles is None:
+                continue
+            found = np.round(circles[0, :, :2]).astype(np.int64)
+            mismatches += [f"{n_balls} balls, seed {seed}, {m}" for m in check_categorize(found, masked)]
+            checked += 1
+    return checked, mismatches
+
+
+def print_results(results):
+    header = f"{'balls':>5} " + " ".join(f"{stage:>15}" for stage in STAGES)
+    print("Median (min) time per stage in ms")
+    print(header)
+    for result in results:
+        print(f"{result['balls']:>5} " + " ".join(
+            f"{result['ms'][stage]['median']:>7.2f} ({result['ms'][stage]['min']:>5.2f})" for stage in STAGES))
+
+    print("\nAccuracy against the synthetic layout")
+    for result in results:
+        print(f"{result['balls']:>5} balls: recall {result['recall']:.3f}, precision {result['precision']:.3f}, "
+              f"max centre error {result['max_error']:.1f} px, type accuracy {result['type_accuracy']:.3f}, "
+              f"{result['shots']:.0f} shots / {result['valid_shots']:.0f} valid")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage benchmark on synthetic tables")
+    parser.add_argument("--balls", type=int, nargs="+", default=[2, 8, 16], help="ball counts to benchmark")
+    parser.add_argument("--tables", type=int, default=5, help="synthetic tables per ball count")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every stage per table")
+    parser.add_argument("--noise", type=float, default=6.0, help="pixel noise standard deviation")
+    parser.add_argument("--lighting", type=float, default=0.2, help="uneven lighting strength")
+    parser.add_argument("--cushions", type=int, help="time banks and kicks off up to this many cushions")
+    parser.add_argument("--threads", type=int, default=1, help="OpenCV threads (1 = reproducible timings)")
+    parser.add_argument("--json", metavar="FILE", help="also write the results as JSON")
+    parser.add_argument("--check", action="store_true",
+                        help="check the batched stages against their scalar versions instead of timing them")
+    args = parser.parse_args()
+
+    cv.setNumThreads(args.threads)
+    if args.check:
+        with quiet():
+            checked, mismatches = check(args.balls, args.tables, args.noise, args.lighting)
+        for mismatch in mismatches:
+            print(f"[CHECK] {mismatch}")
+        print(f"[CHECK] {checked} tables, {len(mismatches)} mismatches: {'FAIL' if mismatches else 'OK'}")
+        sys.exit(1 if mismatches else 0)
+
+    with quiet():
+        results = run(args.balls, args.tables, args.repeat, args.noise, args.lighting, args.cushions)
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nResults written to {args.json}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
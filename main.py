@@ -3,7 +3,9 @@ from poollib.Table import Table
 
 def main():
     ### ------------ INIT ------------ ###
-    # Initialize Table object with path to image
+    # Initialize Table object with path to image (HEIC, JPG or PNG), encoded image bytes or a BGR array
+    # (pass cache_dir="./cache" to reuse detection results of a photo seen before,
+    # sink=print_sink from poollib.instrument to print the time of every stage)
     t1 = Table("./samples/photo04.jpg")
 
     ### ------------ PREPROCESSING ------------ ###
@@ -11,6 +13,11 @@ def main():
     # t1.transform()
     # Normalize colors (only for raw photos)
     # t1.normalize()
+    # Fixed camera: save its perspective, table color and pockets once, then reuse them
+    # with Table(path, calibration="./rig.npz") to skip those searches on later photos
+    # t1.calibrate("./rig.npz")
+    # Video or frame sequence of a fixed camera: VideoTable("./game.mp4").frames() yields
+    # (frame number, Table) only for changed frames, with balls tracked between them
 
     ### ------------ BALL DETECTION ------------ ###
     # Detect balls and store them in Table object
@@ -21,7 +28,8 @@ def main():
     # t1.print_balls()
 
     ### ------------ SHOT CALCULATION ------------ ###
-    # Calculate all shots (type argument: "all", "stripe", "solid", "black")
+    # Calculate all shots (type argument: "all", "stripe", "solid", "black";
+    # cushions=3 adds banks and kicks off up to 3 cushions)
     t1.calculate_shots()
     t1.visualize()
     t1.save("./shots/all_shots.jpg")
@@ -36,9 +44,17 @@ def main():
     t1.visualize()
     t1.save("./shots/best_shots.jpg")
 
+    # Plan 2-3 shots ahead (beam search over estimated cue ball positions, within a time budget)
+    # plan = t1.plan_shots(depth=3, time_limit=0.2)[0]; plan.get_shots(), plan.get_cue_positions()
+
     # Optionally, print detected shots
     # t1.print_shots()
 
+    # Between turns, update single balls instead of recalculating everything
+    # (only the shots they affect are recomputed, moving the white ball recomputes all)
+    # t1.move_ball(t1.get_balls()[0], 500, 1500)
+    # t1.pocket_ball(t1.get_balls()[1])
+
     ### ------------ DISPLAY / SAVE RESULT ------------ ###
     # Display the current state of the table
     # t1.show()
@@ -0,0 +1,207 @@
+import os
+import struct
+import numpy as np
+
+from .ShotSet import ShotSet
+from .shots_calculations import shot_scores
+from .instrument import progress
+
+# Row layouts of the archive files (little-endian, fixed size, so the files can be memory-mapped)
+# balls: one row per ball of every frame, "type" is the code of BALL_TYPES (-1 = not categorized)
+BALL_DTYPE = np.dtype([
+    ("frame", "<i8"),
+    ("x", "<i4"),
+    ("y", "<i4"),
+    ("type", "i1"),
+    ("pocketed", "?"),
+    ("color", "u1", (3,)),
+])
+
+# shots: one row per shot, "ball" is the row of the target ball within its frame's balls,
+# bank points are (-1, -1) for straight paths (multi-cushion shots keep the first target and
+# the last white bank point), lower scores are better (see SCORE_WEIGHTS)
+SHOT_DTYPE = np.dtype([
+    ("frame", "<i8"),
+    ("ball", "<i4"),
+    ("hole_idx", "i1"),
+    ("target_bank", "?"),
+    ("white_bank", "?"),
+    ("white", "<i4", (2,)),
+    ("target", "<i4", (2,)),
+    ("hole", "<i4", (2,)),
+    ("target_edge", "<i4", (2,)),
+    ("white_edge", "<i4", (2,)),
+    ("ghost", "<i4", (2,)),
+    ("angle", "<f8"),
+    ("length", "<f8"),
+    ("score", "<f8"),
+])
+
+# index: one row per frame, its rows in balls.npy and shots.npy
+INDEX_DTYPE = np.dtype([
+    ("frame", "<i8"),
+    ("name", "S64"),
+    ("ball_start", "<i8"),
+    ("ball_count", "<i4"),
+    ("shot_start", "<i8"),
+    ("shot_count", "<i4"),
+])
+
+FILES = {"index": INDEX_DTYPE, "balls": BALL_DTYPE, "shots": SHOT_DTYPE}
+
+# Bytes reserved for the .npy header, so the row count can be rewritten in place on append
+HEADER_SIZE = 1024
+
+
+# The Archive class stores the results of many analyzed frames in a directory of .npy files
+# (index.npy, balls.npy, shots.npy) with fixed row layouts. Frames are appended in batches,
+# and the files are read back with np.load(mmap_mode="r") without loading them into memory.
+# The index is written last, so frames of an interrupted append are never visible to readers.
+class Archive:
+    def __init__(self, path):
+        self.__path = path
+        os.makedirs(path, exist_ok=True)
+        for name, dtype in FILES.items():
+            file_path = self.__file(name)
+            if not os.path.exists(file_path):
+                with open(file_path, "wb") as file:
+                    file.write(_header(dtype, 0))
+            elif _read_header(file_path)[0] != dtype:
+                raise Exception(f"[ARCHIVE] {file_path} has a different row layout")
+
+    def __len__(self):
+        # Number of archived frames
+        return _read_header(self.__file("index"))[1]
+
+    def append(self, tables, frames=None, weights=None):
+        # Appends the balls and current shots of analyzed tables
+        # tables  - Table objects (after detect/categorize, and calculate_shots or later stages)
+        # frames  - frame ids of the tables (e.g. video frame numbers), default continues the index
+        # weights - score weights (see SCORE_WEIGHTS) of the stored shot scores
+        # returns the frame ids of the appended tables
+        tables = list(tables)
+        return self.append_rows([table.get_name() for table in tables],
+                                [ball_rows(table.get_ball_set()) for table in tables],
+                                [shot_rows(table.get_shot_batch(), weights) for table in tables], frames)
+
+    def append_rows(self, names, balls, shots, frames=None):
+        # Appends frames given as rows (see ball_rows and shot_rows), one file write per file
+        # names - frame names, balls/shots - one array of rows per frame (their "frame" is set here)
+        names = list(names)
+        if frames is None:
+            index = self.get_index()
+            start = int(index["frame"][-1]) + 1 if len(index) else 0
+            frames = range(start, start + len(names))
+        frames = np.asarray(frames, dtype=np.int64).reshape(-1)
+        if not len(frames) == len(names) == len(balls) == len(shots):
+            raise Exception("[ARCHIVE] Number of frame ids does not match the number of frames")
+
+        # Rows after the last indexed frame belong to an interrupted append and are overwritten
+        last = self.get_index()[-1:]
+        ball_end = int((last["ball_start"] + last["ball_count"]).sum())
+        shot_end = int((last["shot_start"] + last["shot_count"]).sum())
+
+        index = np.zeros(len(frames), dtype=INDEX_DTYPE)
+        index["frame"] = frames
+        index["name"] = [name.encode()[:64] for name in names]
+        index["ball_count"] = [len(rows) for rows in balls]
+        index["shot_count"] = [len(rows) for rows in shots]
+        index["ball_start"] = ball_end + np.cumsum(index["ball_count"]) - index["ball_count"]
+        index["shot_start"] = shot_end + np.cumsum(index["shot_count"]) - index["shot_count"]
+
+        balls = np.concatenate([np.zeros(0, dtype=BALL_DTYPE)] + list(balls))
+        shots = np.concatenate([np.zeros(0, dtype=SHOT_DTYPE)] + list(shots))
+        balls["frame"] = np.repeat(frames, index["ball_count"])
+        shots["frame"] = np.repeat(frames, index["shot_count"])
+
+        _write_rows(self.__file("balls"), balls, ball_end)
+        _write_rows(self.__file("shots"), shots, shot_end)
+        _write_rows(self.__file("index"), index, len(self))
+        progress(f"[ARCHIVE] {len(frames)} frames appended to {self.__path}")
+        return frames
+
+    def get_index(self):
+        return _open(self.__file("index"))
+
+    def get_balls(self):
+        return _open(self.__file("balls"))
+
+    def get_shots(self):
+        return _open(self.__file("shots"))
+
+    def get_frame(self, frame):
+        # (balls, shots) rows of one archived frame id
+        index = self.get_index()
+        rows = np.flatnonzero(index["frame"] == frame)
+        if not len(rows):
+            raise Exception(f"[ARCHIVE] Frame {frame} is not archived")
+        entry = index[rows[-1]]
+        ball_start, shot_start = int(entry["ball_start"]), int(entry["shot_start"])
+        return (self.get_balls()[ball_start:ball_start + int(entry["ball_count"])],
+                self.get_shots()[shot_start:shot_start + int(entry["shot_count"])])
+
+    def __file(self, name):
+        return os.path.join(self.__path, f"{name}.npy")
+
+
+# Archive rows of a BallSet (frame id 0 until appended)
+def ball_rows(ball_set):
+    rows = np.zeros(len(ball_set), dtype=BALL_DTYPE)
+    rows["x"], rows["y"] = ball_set.get_centers().T
+    rows["type"] = ball_set.get_type_codes()
+    rows["pocketed"] = ball_set.get_pocketed()
+    rows["color"] = ball_set.get_colors()
+    return rows
+
+
+# Archive rows of a shot batch (with "ball_idx", see Table.get_shot_batch), None gives no rows
+def shot_rows(batch, weights=None):
+    if batch is None:
+        return np.zeros(0, dtype=SHOT_DTYPE)
+    rows = np.zeros(len(batch["angle"]), dtype=SHOT_DTYPE)
+    rows["ball"] = batch["ball_idx"]
+    rows["hole_idx"] = batch["hole_idx"]
+    for key in ("target_bank", "white_bank", "white", "target", "hole", "angle", "length"):
+        rows[key] = batch[key]
+    for key, bank in (("target_edge", "target_bank"), ("white_edge", "white_bank")):
+        rows[key] = np.where(batch[bank][:, None], batch[key], -1)
+    # Ghost ball in pixels like Shot.get_ghost
+    rows["ghost"] = np.trunc(batch["ghost"])
+    rows["score"] = shot_scores(batch["angle"], batch["length"], ShotSet(batch).get_banks(), weights)
+    return rows
+
+
+#### NPY FILES ####
+# .npy version 1.0 header padded to HEADER_SIZE bytes
+def _header(dtype, count):
+    header = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (count,)})
+    header = header.ljust(HEADER_SIZE - 10 - 1) + "\n"
+    return np.lib.format.MAGIC_PREFIX + b"\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+# (dtype, row count) of an archive file
+def _read_header(path):
+    with open(path, "rb") as file:
+        np.lib.format.read_magic(file)
+        shape, _, dtype = np.lib.format.read_array_header_1_0(file)
+    return dtype, shape[0]
+
+
+# Writes rows after the first `start` rows (dropping any rows behind them), then the new
+# row count into the header
+def _write_rows(path, rows, start):
+    with open(path, "r+b") as file:
+        file.seek(HEADER_SIZE + start * rows.dtype.itemsize)
+        file.write(rows.tobytes())
+        file.truncate()
+        file.flush()
+        file.seek(0)
+        file.write(_header(rows.dtype, start + len(rows)))
+
+
+# Read-only memory map of an archive file (an empty array for files without rows)
+def _open(path):
+    dtype, count = _read_header(path)
+    if count == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.load(path, mmap_mode="r")
@@ -1,8 +1,13 @@
 from .categorize import categorize
 
+# Possible ball types, in the order used for numeric type codes
+BALL_TYPES = ("white", "black", "stripe", "solid")
+
 # The Ball class stores data for a single billiard ball as an object
 
 class Ball:
+    __slots__ = ("__x", "__y", "__type", "__color", "__pocketed")
+
     def __init__(self, x, y):
         self.__x = x
         self.__y = y
@@ -19,5 +24,19 @@ class Ball:
     def get_type(self):
         return self.__type
     
+    def set_category(self, type, color):
+        self.__type = type
+        self.__color = color
+
+    def set_coordinates(self, x, y):
+        self.__x = x
+        self.__y = y
+
+    def pocket(self):
+        self.__pocketed = True
+
+    def is_pocketed(self):
+        return bool(self.__pocketed)
+
     def categorize(self, img):
         self.__type, self.__color = categorize(self.__x, self.__y, img)
\ No newline at end of file
@@ -0,0 +1,119 @@
+import numpy as np
+
+from .Ball import Ball, BALL_TYPES
+
+
+# The BallSet class stores all balls of a table as arrays (struct of arrays):
+# centres (B, 2), type codes (index into BALL_TYPES, -1 = not categorized), BGR colors and
+# pocketed flags. Ball views give the usual Ball getters for single balls.
+class BallSet:
+    def __init__(self, centers, type_codes=None, colors=None, pocketed=None):
+        self.__centers = np.array(centers, dtype=np.int64).reshape(-1, 2)
+        count = len(self.__centers)
+        self.__types = (np.full(count, -1, dtype=np.int8) if type_codes is None
+                        else np.array(type_codes, dtype=np.int8).reshape(count))
+        self.__colors = (np.zeros((count, 3), dtype=np.uint8) if colors is None
+                         else np.array(colors, dtype=np.uint8).reshape(count, 3))
+        self.__pocketed = (np.zeros(count, dtype=bool) if pocketed is None
+                           else np.array(pocketed, dtype=bool).reshape(count))
+        self.__views = [BallView(self, i) for i in range(count)]
+
+    @classmethod
+    def from_balls(cls, balls):
+        # Copy a list of Ball objects (or views) into a new set
+        balls = list(balls)
+        types = [type_code(ball.get_type()) for ball in balls]
+        colors = [ball.get_color() if ball.get_color() is not None else (0, 0, 0) for ball in balls]
+        return cls([ball.get_coordinates() for ball in balls], types, colors,
+                   [ball.is_pocketed() for ball in balls])
+
+    def __len__(self):
+        return len(self.__centers)
+
+    def __getitem__(self, i):
+        return self.__views[i]
+
+    def __iter__(self):
+        return iter(self.__views)
+
+    def get_centers(self):
+        return self.__centers
+
+    def get_type_codes(self):
+        return self.__types
+
+    def get_colors(self):
+        return self.__colors
+
+    def get_pocketed(self):
+        return self.__pocketed
+
+    def get_types(self):
+        return [BALL_TYPES[code] if code >= 0 else None for code in self.__types.tolist()]
+
+    def set_categories(self, types, colors):
+        # Types and BGR colors of all balls at once
+        self.__types[:] = [type_code(t) for t in types]
+        self.__colors[:] = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+
+    def active(self):
+        # Indices of the balls still on the table
+        return np.flatnonzero(~self.__pocketed)
+
+    def index_of(self, ball):
+        # Position of a view of this set
+        if isinstance(ball, BallView) and ball.get_set() is self:
+            return ball.get_index()
+        raise Exception("[BALLS] Ball is not on this table")
+
+
+# Type code of a ball type name (-1 for None)
+def type_code(ball_type):
+    return BALL_TYPES.index(ball_type) if ball_type in BALL_TYPES else -1
+
+
+# The BallView class is a Ball backed by one row of a BallSet
+class BallView(Ball):
+    __slots__ = ("__set", "__i")
+
+    def __init__(self, ball_set, i):
+        self.__set = ball_set
+        self.__i = i
+
+    def get_set(self):
+        return self.__set
+
+    def get_index(self):
+        return self.__i
+
+    def get_coordinates(self):
+        x, y = self.__set.get_centers()[self.__i].tolist()
+        return x, y
+
+    def get_color(self):
+        if self.__set.get_type_codes()[self.__i] < 0:
+            return None
+        return self.__set.get_colors()[self.__i].tolist()
+
+    def get_type(self):
+        code = int(self.__set.get_type_codes()[self.__i])
+        return BALL_TYPES[code] if code >= 0 else None
+
+    def set_category(self, type, color):
+        self.__set.get_type_codes()[self.__i] = type_code(type)
+        self.__set.get_colors()[self.__i] = color
+
+    def set_coordinates(self, x, y):
+        self.__set.get_centers()[self.__i] = (x, y)
+
+    def pocket(self):
+        self.__set.get_pocketed()[self.__i] = True
+
+    def is_pocketed(self):
+        return bool(self.__set.get_pocketed()[self.__i])
+
+    def categorize(self, img):
+        x, y = self.get_coordinates()
+        ball = Ball(x, y)
+        ball.categorize(img)
+        self.set_category(ball.get_type(), ball.get_color())
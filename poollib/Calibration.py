@@ -0,0 +1,69 @@
+import hashlib
+import numpy as np
+
+from .instrument import progress
+
+
+# The Calibration class stores everything that is constant for a camera bolted above a table:
+# the perspective matrix of the raw photos, the HSV range of the cloth and the pocket mask.
+# It is computed once from a reference frame (Table.calibrate) and reused for later frames.
+class Calibration:
+    def __init__(self, matrix, color_range, pocket_mask):
+        # matrix      - 3x3 perspective matrix, None for photos that are already top-down
+        # color_range - (lower, upper) HSV range of the table cloth
+        # pocket_mask - uint8 mask (255 = pocket) of the transformed table image
+        self.__matrix = None if matrix is None else np.asarray(matrix, dtype=np.float64)
+        self.__color_range = tuple(np.asarray(bound, dtype=np.float64) for bound in color_range)
+        self.__pocket_mask = np.where(np.asarray(pocket_mask) > 0, 255, 0).astype(np.uint8)
+
+    def get_matrix(self):
+        return self.__matrix
+
+    def get_color_range(self):
+        return self.__color_range
+
+    def get_pocket_mask(self):
+        return self.__pocket_mask
+
+    def get_size(self):
+        # (width, height) of the transformed images this profile applies to
+        height, width = self.__pocket_mask.shape
+        return width, height
+
+    def digest(self):
+        # Short fingerprint of the profile, changes whenever any calibrated value changes
+        digest = hashlib.blake2b(digest_size=8)
+        if self.__matrix is not None:
+            digest.update(self.__matrix.tobytes())
+        for bound in self.__color_range:
+            digest.update(bound.tobytes())
+        digest.update(str(self.__pocket_mask.shape).encode())
+        digest.update(np.packbits(self.__pocket_mask > 0).tobytes())
+        return digest.hexdigest()
+
+    def save(self, path):
+        # Stores the profile as a compressed .npz file (the pocket mask with 1 bit per pixel)
+        with open(path, "wb") as file:
+            np.savez_compressed(
+                file,
+                matrix=np.zeros((0, 3)) if self.__matrix is None else self.__matrix,
+                lower=self.__color_range[0],
+                upper=self.__color_range[1],
+                mask_shape=np.array(self.__pocket_mask.shape),
+                mask=np.packbits(self.__pocket_mask > 0),
+            )
+        progress(f"[CALIBRATION] Profile saved to {path}")
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with np.load(path) as profile:
+                matrix = profile["matrix"]
+                color_range = (profile["lower"], profile["upper"])
+                mask_shape = tuple(profile["mask_shape"])
+                packed_mask = profile["mask"]
+        except (OSError, KeyError, ValueError):
+            raise Exception(f"[CALIBRATION] Failed to load profile {path}")
+
+        pocket_mask = np.unpackbits(packed_mask, count=int(np.prod(mask_shape))).reshape(mask_shape)
+        return cls(matrix if matrix.size else None, color_range, pocket_mask)
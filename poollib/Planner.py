@@ -0,0 +1,225 @@
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .ShotSet import ShotSet
+from .shot_init import BALL_DIAMETER
+from .shots_calculations import shot_scores, HOLE_DIAMETER
+from .shots_batch import get_shots_batch, get_rail_shots_batch, validate_batch, take_shots, HOLES, EDGE_VALUE
+
+# Shots per plan and plans kept after every step of the beam search
+PLAN_DEPTH = 2
+BEAM_WIDTH = 5
+
+# Search budget: positions expanded (shot generation + validation) and wall time in seconds
+MAX_NODES = 200
+TIME_LIMIT = 0.5
+
+# Cue ball positions closer than this (pixels) count as the same position in the transposition cache
+# (only for the estimated positions after a shot; the actual cue ball position is always exact)
+LAYOUT_QUANTUM = 10
+
+# Positions kept in the transposition cache
+CACHE_SIZE = 4096
+
+# Distance the cue ball rolls on after contact, as a fraction of the shot length
+# (scaled by the sine of the cut, a full ball hit stops the cue ball on the ghost position)
+CUE_TRAVEL = 0.5
+
+# Score added to a plan that leaves no valid shot while target balls remain
+NO_SHOT_SCORE = 100000
+
+
+# The Plan class stores one sequence of shots found by the Planner
+class Plan:
+    def __init__(self, score, shots, cue_positions, remaining):
+        # score         - sum of the shot scores (lower is better), plus NO_SHOT_SCORE if it ends snookered
+        # shots         - Shot views, in playing order
+        # cue_positions - estimated cue ball position after every shot
+        # remaining     - mask of the planner's balls still on the table after the last shot
+        self.__score = score
+        self.__shots = shots
+        self.__cue_positions = cue_positions
+        self.__remaining = remaining
+
+    def get_score(self):
+        return self.__score
+
+    def get_shots(self):
+        return self.__shots
+
+    def get_cue_positions(self):
+        return self.__cue_positions
+
+    def get_remaining(self):
+        return self.__remaining
+
+    def get_white(self):
+        return self.__cue_positions[-1] if self.__cue_positions else None
+
+
+# The Planner class searches sequences of shots with a beam search. After every shot the target
+# ball is removed and the cue ball is moved to its estimated resting position (see cue_rest).
+# Positions already expanded are kept in a transposition cache keyed by the quantized cue ball
+# position and the set of balls left, so the same layout reached by different sequences
+# (A then B, B then A) is only evaluated once. The balls other than the cue ball never move.
+class Planner:
+    def __init__(self, centers, targets, weights=None, cushions=None, cache_size=CACHE_SIZE):
+        # centers  - (B, 2) centres of all balls except the cue ball
+        # targets  - mask of the balls that may be potted
+        # weights  - score weights, see SCORE_WEIGHTS
+        # cushions - banks and kicks off up to this many cushions (None = one-cushion shots)
+        self.__centers = np.array(centers, dtype=np.int64).reshape(-1, 2)
+        self.__targets = np.array(targets, dtype=bool).reshape(len(self.__centers))
+        self.__weights = weights
+        self.__cushions = cushions
+        self.__cache = OrderedDict()
+        self.__cache_size = cache_size
+        self.__hits = 0
+        self.__nodes = 0
+
+    def matches(self, centers, targets, weights=None, cushions=None):
+        # True if this planner (and its cache) is valid for the given balls and settings
+        return (np.array_equal(self.__centers, centers) and np.array_equal(self.__targets, targets)
+                and self.__weights == weights and self.__cushions == cushions)
+
+    def get_stats(self):
+        # Positions expanded and cache hits of the last plan() call, cache size
+        return {"nodes": self.__nodes, "cache_hits": self.__hits, "cached": len(self.__cache)}
+
+    def plan(self, white, remaining=None, depth=PLAN_DEPTH, beam=BEAM_WIDTH, k=1,
+             max_nodes=MAX_NODES, time_limit=TIME_LIMIT):
+        # Best k plans of up to depth shots from the given cue ball position
+        # remaining - mask of the balls on the table (all if None)
+        # The first shot is always searched; when the budget runs out later, the plans of the
+        # last completed step are returned (plans of the same length compete with each other)
+        deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        self.__hits = self.__nodes = 0
+        if remaining is None:
+            remaining = np.ones(len(self.__centers), dtype=bool)
+        white = tuple(int(v) for v in white)
+
+        beams = [Plan(0.0, [], [], np.array(remaining, dtype=bool))]
+        finished = []
+        for step in range(depth):
+            extended = []
+            for plan in beams:
+                if step and (self.__nodes >= max_nodes
+                             or (deadline is not None and time.perf_counter() > deadline)):
+                    finished.extend(beams)
+                    beams = []
+                    break
+                extended.extend(self.__extend(plan, white, beam, finished))
+            if not beams:
+                break
+            # Plans reaching the same layout (transpositions) are continued only once
+            layouts = {}
+            for plan in sorted(extended, key=Plan.get_score):
+                layouts.setdefault(layout_key(plan.get_white(), plan.get_remaining()), plan)
+            beams = list(layouts.values())[:beam]
+
+        finished.extend(beams)
+        plans = [plan for plan in finished if plan.get_shots()]
+        return sorted(plans, key=Plan.get_score)[:k]
+
+    def __extend(self, plan, start, beam, finished):
+        # Plans one shot longer than plan (at most beam of them); finished plans go to finished
+        white = plan.get_white() or start
+        remaining = plan.get_remaining()
+        if not (remaining & self.__targets).any():
+            finished.append(plan)
+            return []
+
+        batch, scores, rest = self.__expand(white, remaining, exact=not plan.get_shots())
+        if not len(scores):
+            finished.append(Plan(plan.get_score() + NO_SHOT_SCORE, plan.get_shots(),
+                                 plan.get_cue_positions(), remaining))
+            return []
+
+        plans = []
+        shots = ShotSet(batch)
+        for row in np.argsort(scores, kind="stable")[:beam].tolist():
+            left = remaining.copy()
+            left[batch["ball_idx"][row]] = False
+            plans.append(Plan(plan.get_score() + scores[row], plan.get_shots() + [shots[row]],
+                              plan.get_cue_positions() + [tuple(rest[row].tolist())], left))
+        return plans
+
+    def __expand(self, white, remaining, exact=False):
+        # Valid shots from a position (cached): (batch with "ball_idx", scores, cue ball rest positions)
+        # Shots that leave the cue ball in a pocket are dropped
+        # exact - key the cache on the exact cue ball position (the root of a search, where the shots
+        #         returned to the caller must start from the actual cue ball)
+        key = layout_key(white, remaining, 1 if exact else LAYOUT_QUANTUM)
+        if key in self.__cache:
+            self.__hits += 1
+            self.__cache.move_to_end(key)
+            return self.__cache[key]
+
+        self.__nodes += 1
+        targets = np.flatnonzero(remaining & self.__targets)
+        if self.__cushions is None:
+            batch = get_shots_batch(white, self.__centers[targets])
+        else:
+            batch = get_rail_shots_batch(white, self.__centers[targets], self.__cushions)
+        batch["ball_idx"] = targets[batch["target_idx"]]
+        balls = np.concatenate([self.__centers[remaining], [white]])
+        valid, _ = validate_batch(batch, balls, BALL_DIAMETER // 2)
+        batch = take_shots(batch, valid)
+
+        rest = cue_rest(batch)
+        keep = ~in_pocket(rest)
+        batch = take_shots(batch, keep)
+        scores = shot_scores(batch["angle"], batch["length"], ShotSet(batch).get_banks(), self.__weights)
+        result = (batch, scores, rest[keep])
+
+        self.__cache[key] = result
+        if len(self.__cache) > self.__cache_size:
+            self.__cache.popitem(last=False)
+        return result
+
+
+# Transposition key of a position: quantized cue ball position and the balls left
+# (the quantum is part of the key, so exact and rounded positions never share an entry)
+def layout_key(white, remaining, quantum=LAYOUT_QUANTUM):
+    return (quantum, round(white[0] / quantum), round(white[1] / quantum), np.packbits(remaining).tobytes())
+
+
+# Estimated resting position (pixels) of the cue ball after every shot of a batch.
+# Stun shot model: after contact the cue ball leaves the ghost position along the tangent line
+# (perpendicular to the target ball's path) and rolls CUE_TRAVEL * length * sin(cut);
+# cushions reflect it (the path is folded back into the cloth area).
+def cue_rest(batch):
+    ghost = batch["ghost"]
+    incoming = ghost - np.where(batch["white_bank"][:, None], batch["white_edge"], batch["white"])
+    outgoing = np.where(batch["target_bank"][:, None], batch["target_edge"], batch["hole"]) - batch["target"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unit = outgoing / np.hypot(outgoing[:, 0], outgoing[:, 1])[:, None]
+        tangent = incoming - (incoming * unit).sum(axis=1)[:, None] * unit
+        tangent_length = np.hypot(tangent[:, 0], tangent[:, 1])
+        direction = np.nan_to_num(tangent / tangent_length[:, None])
+        sin_cut = np.nan_to_num(tangent_length / np.hypot(incoming[:, 0], incoming[:, 1]))
+
+    travel = CUE_TRAVEL * batch["length"] * sin_cut
+    rest = ghost + direction * travel[:, None]
+
+    # Cloth area reachable by the ball centre, between the cushion lines (top, right, bottom, left)
+    radius = BALL_DIAMETER / 2
+    low = np.array([EDGE_VALUE[3], EDGE_VALUE[0]]) + radius
+    high = np.array([EDGE_VALUE[1], EDGE_VALUE[2]]) - radius
+    return np.trunc(fold(np.nan_to_num(rest), low, high)).astype(np.int64)
+
+
+# Folds coordinates into [low, high] as if reflected by the boundaries
+def fold(points, low, high):
+    span = high - low
+    offset = np.mod(points - low, 2 * span)
+    return low + np.where(offset > span, 2 * span - offset, offset)
+
+
+# True for positions inside a pocket
+def in_pocket(points):
+    d = points[:, None, :] - HOLES[None]
+    return (np.hypot(d[..., 0], d[..., 1]) < HOLE_DIAMETER).any(axis=1)
@@ -3,6 +3,8 @@ import math
 
 
 class Shot:
+    __slots__ = ("__target_dir", "__white_dir", "__ghost", "__angle", "__length", "__y1length", "__y2length")
+
     def __init__(self, white, target, hole, edge_target=None, edge_white=None):
         # white, target coordinates, hole position, and optional cushions for reflections
 
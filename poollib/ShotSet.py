@@ -0,0 +1,83 @@
+import numpy as np
+
+from .Shot import Shot
+
+
+# The ShotSet class stores shots as fixed-width numeric records: one row per shot in the
+# arrays produced by get_shots_batch (endpoints, bank points, ghost, angle, length).
+# Shot views give the usual Shot getters for single shots without copying the data.
+class ShotSet:
+    def __init__(self, batch):
+        # batch - dict of arrays from get_shots_batch (or take_shots/concat_batches)
+        self.__batch = batch
+
+    def __len__(self):
+        return len(self.__batch["angle"])
+
+    def __getitem__(self, i):
+        return ShotView(self.__batch, i)
+
+    def __iter__(self):
+        return (ShotView(self.__batch, i) for i in range(len(self)))
+
+    def get_batch(self):
+        return self.__batch
+
+    def get_banks(self):
+        # Number of cushions of every shot: banked paths (0, 1 or 2), or all bank points of
+        # multi-cushion shots (see get_rail_shots_batch)
+        if "target_banks" in self.__batch:
+            return self.__batch["target_banks"] + self.__batch["white_banks"]
+        return self.__batch["target_bank"].astype(np.int64) + self.__batch["white_bank"].astype(np.int64)
+
+
+# The ShotView class is a Shot backed by one row of a shot batch
+class ShotView(Shot):
+    __slots__ = ("__batch", "__i")
+
+    def __init__(self, batch, i):
+        self.__batch = batch
+        self.__i = i
+
+    def get_lines(self):
+        if "target_rails" in self.__batch:
+            return self.__rail_lines()
+        row = self.__i
+        target = tuple(self.__batch["target"][row].tolist())
+        hole = tuple(self.__batch["hole"][row].tolist())
+        white = tuple(self.__batch["white"][row].tolist())
+        ghost = self.get_ghost()
+
+        if self.__batch["target_bank"][row]:
+            edge = tuple(self.__batch["target_edge"][row].tolist())
+            target_dir = {"y1": (target, edge), "y2": (edge, hole)}
+        else:
+            target_dir = {"y1": (target, hole)}
+        if self.__batch["white_bank"][row]:
+            edge = tuple(self.__batch["white_edge"][row].tolist())
+            white_dir = {"y1": (white, edge), "y2": (edge, ghost)}
+        else:
+            white_dir = {"y1": (white, ghost)}
+        return target_dir, white_dir
+
+    def __rail_lines(self):
+        # Lines y1, y2, ... over every bank point of a multi-cushion shot
+        row = self.__i
+        target = [tuple(self.__batch["target"][row].tolist())]
+        target += [tuple(p) for p in self.__batch["target_rails"][row, :self.__batch["target_banks"][row]].tolist()]
+        target.append(tuple(self.__batch["hole"][row].tolist()))
+        white = [tuple(self.__batch["white"][row].tolist())]
+        white += [tuple(p) for p in self.__batch["white_rails"][row, :self.__batch["white_banks"][row]].tolist()]
+        white.append(self.get_ghost())
+        return ({f"y{i + 1}": line for i, line in enumerate(zip(target, target[1:]))},
+                {f"y{i + 1}": line for i, line in enumerate(zip(white, white[1:]))})
+
+    def get_ghost(self):
+        x, y = self.__batch["ghost"][self.__i].tolist()
+        return int(x), int(y)
+
+    def get_angle(self):
+        return self.__batch["angle"][self.__i].item()
+
+    def get_length(self):
+        return self.__batch["length"][self.__i].item()
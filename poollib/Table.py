@@ -1,41 +1,108 @@
 import cv2 as cv
 import numpy as np
-import tkinter as tk
 
-from .transform import transform, heic2opencv
+from .transform import find_perspective, warp, heic2opencv, is_heic
 from .normalize import normalize
-from .detect import detect_balls
+from .detect import find_circles, remove_table, table_color_range, pocket_mask, HOUGH_PARAMS
 from .visualize import visualize
-from .Ball import Ball
-from .shots_calculations import get_shots, is_shot_blocked, get_best_shots, is_edge_possible
+from .Ball import BALL_TYPES
+from .BallSet import BallSet
+from .categorize import categorize_batch, BATCH_PARAMS
+from .cache import cache_key, load_detection, save_detection, CACHE_VERSION
+from .TableIndex import TableIndex
+from .Calibration import Calibration
+from .shots_calculations import rank_shots, RECOMMENDATIONS
+from .ShotSet import ShotSet
+from .Planner import Planner, PLAN_DEPTH, BEAM_WIDTH, MAX_NODES, TIME_LIMIT
+from .instrument import progress, stage
+from .shots_batch import (get_shots_batch, get_rail_shots_batch, validate_batch, take_shots, concat_batches,
+                          shot_segments, find_blocked_segments, HOLES, SHOT_ORDER)
 
 # Table class loads and stores an image of the table
 # Methods allow processing for analysis of balls and possible shots
 class Table:
-    def __init__(self, input_file):
-        # Load image (HEIC or JPG)
-        ext = input_file.split(".")[-1].lower()
-        if ext == "heic":
-            self.__img = heic2opencv(input_file)
-        elif ext == "jpg":
-            self.__img = cv.imread(input_file)
+    def __init__(self, input_file, cache_dir=None, calibration=None, sink=None, memory=False):
+        # sink   - receives a timing record for every stage run on this table (see instrument.stage),
+        #          e.g. a list's append method, jsonl_sink(file) or print_sink
+        # memory - include the tracemalloc peak of every stage in the records (slower)
+        self.__sink = sink
+        self.__memory = memory
+        if isinstance(input_file, (np.ndarray, bytes, bytearray, memoryview)):
+            self.__name = "frame" if isinstance(input_file, np.ndarray) else "bytes"
         else:
-            raise Exception(f"[TABLE INIT] Unsupported image format")
+            self.__name = input_file.split("/")[-1]
 
-        if self.__img is None:
-            raise Exception(f"[TABLE INIT] Failed to load image")
+        # Load image: file path (HEIC, JPG or PNG), encoded image bytes (e.g. received over a queue)
+        # or an already decoded BGR frame (e.g. from a video)
+        with self.__measure("load") as counts:
+            if self.__name == "frame":
+                self.__img = input_file
+            elif self.__name == "bytes":
+                if is_heic(input_file):
+                    self.__img = heic2opencv(input_file)
+                else:
+                    self.__img = cv.imdecode(np.frombuffer(input_file, dtype=np.uint8), cv.IMREAD_COLOR)
+            else:
+                ext = input_file.split(".")[-1].lower()
+                if ext in ("heic", "heif"):
+                    self.__img = heic2opencv(input_file)
+                elif ext in ("jpg", "jpeg", "png"):
+                    self.__img = cv.imread(input_file)
+                else:
+                    raise Exception(f"[TABLE INIT] Unsupported image format")
 
-        self.__name = input_file.split("/")[-1]
-        self.__height, self.__width = self.__img.shape[:2]
+            if self.__img is None:
+                raise Exception(f"[TABLE INIT] Failed to load image")
 
-        # Detected balls
-        self.__balls = []
+            # A frame belongs to the caller, so it is never modified in place
+            self.__shared = self.__name == "frame"
+            self.__height, self.__width = self.__img.shape[:2]
+            counts.update(width=self.__width, height=self.__height)
 
-        # Calculated shots
-        self.__shots = []
+        # Calibration profile of a fixed camera (path or Calibration object), see calibrate()
+        if isinstance(calibration, str):
+            calibration = Calibration.load(calibration)
+        self.__calibration = calibration
+        self.__matrix = None
+
+        # Detected balls (as arrays, see BallSet) and their spatial index (built after detection)
+        self.__balls = BallSet([])
+        self.__index = None
+
+        # Current shots as arrays (one row per shot, Shot views are created by get_shots)
+        self.__shot_batch = None
+
+        # Balls and shots to draw when the image is needed (see visualize)
+        self.__drawing = None
+
+        # All calculated shots with their validation results, kept so that moving or pocketing
+        # a ball only recomputes the shots it affects (see move_ball); stage is the last step run
+        self.__candidates = None
+        self.__valid = None
+        self.__blocker = None
+        self.__stage = "shots"
+        # Cushions of multi-cushion shots (None = one-cushion banks of get_shots_batch)
+        self.__cushions = None
+        self.__ranking = (RECOMMENDATIONS, None, False)
+        self.__active = np.zeros(0, dtype=np.int64)
+
+        # Multi-shot planner, kept with its transposition cache while the balls do not change
+        self.__planner = None
+
+        # Optional on-disk cache of detection + categorization results
+        # (key of the current detection and its table mask, kept until categorization is saved)
+        self.__cache_dir = cache_dir
+        self.__cache_key = None
+        self.__table_mask = None
+        self.__categorized = False
+        self.__pyramid = False
 
     def show(self):
+        self.__render()
         if self.__img is not None:
+            # tkinter is only needed here (screen size), so it is not imported with the module
+            import tkinter as tk
+
             root = tk.Tk()
             scale = int(0.75 * root.winfo_screenheight())
             root.destroy()
@@ -45,113 +112,401 @@ class Table:
             cv.destroyAllWindows()
 
     def save(self, path="./default.jpg"):
+        self.__render()
         if self.__img is not None:
             cv.imwrite(path, self.__img)
 
     def transform(self):
         # Transform table image (perspective correction)
-        self.__img = transform(self.__img)
-        self.__height, self.__width = self.__img.shape[:2]
+        # With a calibration profile the pocket search is skipped and its matrix is used
+        with self.__measure("transform") as counts:
+            progress("-----[Transform Photo]-----")
+            if self.__calibration is not None and self.__calibration.get_matrix() is not None:
+                self.__matrix = self.__calibration.get_matrix()
+                progress("[TRANSFORM] Using calibrated perspective")
+            else:
+                self.__matrix = find_perspective(self.__img)
+            self.__img = warp(self.__img, self.__matrix)
+            self.__shared = False
+            self.__height, self.__width = self.__img.shape[:2]
+            counts["calibrated"] = self.__calibration is not None
+            progress("[TRANSFORM] Image transformed successfully")
 
-    def normalize(self):
+    def calibrate(self, path=None):
+        # Compute a calibration profile from the current (top-down, normalized) frame:
+        # perspective matrix of the last transform(), table cloth HSV range and pocket mask.
+        # Later frames of the same camera pass it as Table(..., calibration=path)
+        with self.__measure("calibrate"):
+            progress("-----[Calibrate]-----")
+            hsv = cv.cvtColor(self.__img, cv.COLOR_BGR2HSV)
+            self.__calibration = Calibration(self.__matrix, table_color_range(hsv), pocket_mask(hsv))
+            progress("[CALIBRATION] Profile computed")
+            if path is not None:
+                self.__calibration.save(path)
+            return self.__calibration
+
+    def normalize(self, white=None):
         # Normalize image (lighting, colors)
-        self.__img = normalize(self.__img)
+        # white - (x, y) of the white ball if already known (e.g. from an earlier frame of the same
+        #         camera); the white ball of this table is used if it is already detected and
+        #         categorized, otherwise the image is searched for a white object
+        with self.__measure("normalize") as counts:
+            if white is None:
+                white = self.__white()
+            if white is not None:
+                white = (tuple(white), BATCH_PARAMS["ball_radius"])
+            counts["white_known"] = white is not None
+            self.__img = normalize(self.__img, white=white, inplace=not self.__shared)
 
-    def detect(self):
+    def detect(self, pyramid=False):
         # Detect balls on the table
-        circles, self.__img = detect_balls(self.__img)
-        if circles is None:
-            raise Exception("[DETECT] No balls detected")
-        circles = np.round(circles[0, :]).astype("int")
-        for (x, y, r) in circles:
-            self.__balls.append(Ball(x, y))
-        print("[DETECT] Balls added")
+        # pyramid - coarse-to-fine detection: several times faster, same centres (see hough_pyramid)
+        with self.__measure("detect") as counts:
+            self.__pyramid = pyramid
+            if self.__cache_dir is not None:
+                self.__cache_key = cache_key(self.__img, self.__cache_params())
+                cached = load_detection(self.__cache_dir, self.__cache_key, self.__cache_params())
+                if cached is not None:
+                    centers, type_codes, colors, table_mask = cached
+                    self.__img = remove_table(self.__img, table_mask)
+                    self.__balls = BallSet(centers, type_codes, colors)
+                    self.__build_index()
+                    self.__categorized = True
+                    counts.update(balls=len(self.__balls), cached=True)
+                    progress("[DETECT] Balls loaded from cache")
+                    return
+
+            color_range, pockets = None, None
+            if self.__calibration is not None:
+                if self.__calibration.get_size() != (self.__width, self.__height):
+                    raise Exception("[DETECT] Calibration profile does not match image size")
+                color_range = self.__calibration.get_color_range()
+                pockets = self.__calibration.get_pocket_mask()
+
+            circles, self.__table_mask = find_circles(self.__img, color_range, pockets, pyramid)
+            if circles is None:
+                raise Exception("[DETECT] No balls detected")
+            self.__img = remove_table(self.__img, self.__table_mask)
+            circles = np.round(circles[0, :]).astype("int")
+            self.__balls = BallSet(circles[:, :2])
+            self.__build_index()
+            counts.update(balls=len(self.__balls), cached=False)
+            progress("[DETECT] Balls added")
+
+    def set_balls(self, balls, img=None):
+        # Use balls found elsewhere (e.g. tracked between video frames) instead of detect()
+        # img - ball-only image matching the balls, as left by detect() (current image if None)
+        if img is not None:
+            self.__img = img
+        self.__balls = balls if isinstance(balls, BallSet) else BallSet.from_balls(balls)
+        self.__build_index()
+        self.__categorized = bool((self.__balls.get_type_codes() >= 0).all())
 
     def print_balls(self):
+        # Balls still on the table
         print("-----[Balls]-----")
-        for i, ball in enumerate(self.__balls, start=1):
+        for i, ball in enumerate(self.get_balls(), start=1):
             print(f"Ball {i}: {ball.get_coordinates()}, color: {ball.get_color()}, type: {ball.get_type()}")
 
     def categorize_balls(self):
         # Determine type/color of each ball
-        print("-----[Categorize Balls]-----")
-        if self.__balls:
-            print("[CATEGORIZE] Categorizing balls", end='')
-            for ball in self.__balls:
-                ball.categorize(self.__img)
-                print(".", end='')
-            print("\n[CATEGORIZE] Balls categorized")
-        else:
-            print("[CATEGORIZE] No balls to categorize")
+        with self.__measure("categorize") as counts:
+            progress("-----[Categorize Balls]-----")
+            if self.__categorized:
+                progress("[CATEGORIZE] Balls already categorized")
+            elif self.__balls:
+                progress("[CATEGORIZE] Categorizing balls")
+                centers = self.__balls.get_centers()
+                categories = categorize_batch(centers, self.__img, **BATCH_PARAMS)
+                self.__balls.set_categories([t for t, _ in categories], [color for _, color in categories])
+                self.__categorized = True
+                counts["balls"] = len(self.__balls)
+                progress("[CATEGORIZE] Balls categorized")
+
+                if self.__cache_key is not None:
+                    save_detection(self.__cache_dir, self.__cache_key, self.__cache_params(), centers,
+                                   self.__balls.get_type_codes(), self.__balls.get_colors(), self.__table_mask)
+                    progress("[CATEGORIZE] Results saved to cache")
+            else:
+                progress("[CATEGORIZE] No balls to categorize")
+
+    def __measure(self, name):
+        # Records one stage of this table to the sink (see instrument.stage)
+        return stage(self.__sink, self.__name, name, self.__memory)
+
+    def __cache_params(self):
+        # Everything besides the image that detection and categorization results depend on
+        calibration = self.__calibration.digest() if self.__calibration is not None else None
+        return {"version": CACHE_VERSION, "hough": HOUGH_PARAMS, "pyramid": self.__pyramid,
+                "categorize": BATCH_PARAMS, "calibration": calibration}
 
     def visualize(self):
         # Visualize table with balls and shots
-        self.__img = visualize(self.__img, self.__balls, self.__shots)
+        # Only a snapshot is taken here, drawing happens when save() or show() needs the pixels
+        with self.__measure("visualize") as counts:
+            balls = BallSet.from_balls(self.get_balls())
+            shots = [] if self.__shot_batch is None else ShotSet({k: v.copy() for k, v in self.__shot_batch.items()})
+            self.__drawing = (balls, shots)
+            counts.update(balls=len(balls), shots=len(shots))
+
+    def __render(self):
+        # Draw the visualization requested by the last visualize() call
+        if self.__drawing is not None:
+            with self.__measure("render"):
+                balls, shots = self.__drawing
+                self.__img = visualize(self.__img, list(balls), shots)
+                self.__drawing = None
 
-    def calculate_shots(self, type="all"):
+    def calculate_shots(self, type="all", cushions=None):
         # Calculate all possible shots for balls of given type
-        print("-----[Calculate Shots]-----")
-        if not self.__balls:
-            print("[SHOTS] No balls detected")
-            return
+        # cushions - banks and kicks off up to this many cushions (mirror method, see
+        #            get_rail_shots_batch); None keeps the one-cushion shots of get_shots_batch
+        with self.__measure("calculate_shots") as counts:
+            progress("-----[Calculate Shots]-----")
+            if not self.__balls:
+                progress("[SHOTS] No balls detected")
+                return
 
-        white = next((b for b in self.__balls if b.get_type() == "white"), None)
-        if not white:
-            print("[SHOTS] White ball not found")
-            return
-        print("[SHOTS] White ball found")
+            white = self.__white()
+            if not white:
+                progress("[SHOTS] White ball not found")
+                return
+            progress("[SHOTS] White ball found")
+
+            if self.__candidates is not None and cushions != self.__cushions:
+                raise Exception("[SHOTS] Shots with a different number of cushions were already calculated")
+            self.__cushions = cushions
 
-        print(f"[SHOTS] Calculating shots for {type}", end='')
-        for ball in self.__balls:
-            if ball.get_type() != "white" and (type == "all" or ball.get_type() == type):
-                self.__shots.extend(get_shots(white, ball))
-                print(".", end='')
-        print("\n[SHOTS] Shots calculated")
+            progress(f"[SHOTS] Calculating shots for {type}")
+            types = np.array(self.__balls.get_types())
+            targets = np.flatnonzero((types != "white") & ~self.__balls.get_pocketed()
+                                     & ((type == "all") | (types == type))).tolist()
+            if targets:
+                batch = self.__candidate_batch(white, targets)
+                self.__candidates = concat_batches(self.__candidates, batch)
+                self.__shot_batch = concat_batches(self.__shot_batch, batch)
+                if self.__valid is not None:
+                    # Shots added after validation stay in the list until validated again
+                    self.__valid = np.concatenate([self.__valid, np.ones(len(batch["ball_idx"]), dtype=bool)])
+                    self.__blocker = np.concatenate([self.__blocker, np.full(len(batch["ball_idx"]), -1)])
+            counts["shots"] = self.__shot_count()
+            progress("[SHOTS] Shots calculated")
 
     def validate_shots(self):
         # Filter valid shots based on angles and obstacles
-        print("-----[Validate Shots]-----")
-        valid_shots = []
+        with self.__measure("validate_shots") as counts:
+            progress("-----[Validate Shots]-----")
 
-        if not self.__shots:
-            print("[VALIDATE] No shots detected")
-            return
+            if not self.__shot_count():
+                progress("[VALIDATE] No shots detected")
+                return
+
+            progress("[VALIDATE] Validating shots")
+            self.__valid, self.__blocker = self.__validate(self.__candidates)
+            self.__stage = "valid"
+            self.__select_shots()
+            counts["shots"] = self.__shot_count()
+            progress("[VALIDATE] Valid shots selected")
 
-        print("[VALIDATE] Validating shots", end='')
-        for shot in self.__shots:
-            print(".", end='')
-            t_dir, w_dir = shot.get_lines()
-            lines = [
-                t_dir.get("y1"),
-                w_dir.get("y1"),
-                t_dir.get("y2") if len(t_dir) > 1 else None,
-                w_dir.get("y2") if len(w_dir) > 1 else None
-            ]
-            angle = shot.get_angle()
-            blocked = [is_shot_blocked(line, self.__balls, 23) for line in lines if line]
-            edges_ok = [is_edge_possible(line) for line in lines if line]
-
-            if not any(blocked) and angle > 120 and all(edges_ok):
-                valid_shots.append(shot)
-
-        self.__shots = valid_shots
-        print("\n[VALIDATE] Valid shots selected")
-
-    def calculate_best_shots(self):
+    def calculate_best_shots(self, k=RECOMMENDATIONS, weights=None, pareto=False):
         # Select best recommended shots
-        print("-----[Best Shots]-----")
-        if not self.__shots:
-            print("[BEST] No shots detected")
+        # k - number of recommendations, weights - score weights (see SCORE_WEIGHTS),
+        # pareto - rank only shots on the angle/length/banks Pareto front
+        with self.__measure("best_shots") as counts:
+            progress("-----[Best Shots]-----")
+            if not self.__shot_count():
+                progress("[BEST] No shots detected")
+                return
+
+            progress("[BEST] Calculating best recommendations")
+            self.__stage = "best"
+            self.__ranking = (k, weights, pareto)
+            self.__select_shots()
+            counts["shots"] = self.__shot_count()
+            progress("[BEST] Recommended shots selected")
+
+    def plan_shots(self, type="all", depth=PLAN_DEPTH, beam=BEAM_WIDTH, k=1, weights=None,
+                   max_nodes=MAX_NODES, time_limit=TIME_LIMIT, cushions=None):
+        # Plan sequences of up to depth shots at balls of given type, taking into account where
+        # the cue ball ends up after every shot (see Planner); does not change the current shots
+        # beam - plans kept per step, max_nodes/time_limit - search budget (positions, seconds)
+        # cushions - consider banks and kicks off up to this many cushions (see calculate_shots)
+        # returns the best k plans (Plan objects), best first
+        with self.__measure("plan_shots") as counts:
+            progress("-----[Plan Shots]-----")
+            white = self.__white()
+            if white is None:
+                progress("[PLAN] White ball not found")
+                return []
+
+            types = np.array(self.__balls.get_types())
+            others = np.flatnonzero(types != "white")
+            targets = (type == "all") | (types[others] == type)
+            centers = self.__balls.get_centers()[others]
+            if self.__planner is None or not self.__planner.matches(centers, targets, weights, cushions):
+                self.__planner = Planner(centers, targets, weights, cushions)
+
+            progress(f"[PLAN] Planning {depth} shots ahead for {type}")
+            plans = self.__planner.plan(white, ~self.__balls.get_pocketed()[others], depth, beam, k,
+                                        max_nodes, time_limit)
+            counts.update(plans=len(plans), **self.__planner.get_stats())
+            progress(f"[PLAN] {len(plans)} plans found")
+            return plans
+
+    def move_ball(self, ball, x, y):
+        # Update the position of one ball (a Ball from get_balls()) and recompute only
+        # the shots it affects: shots at this ball, shots it blocked before and shots it blocks now
+        # Moving the white ball changes every shot, so everything is recomputed
+        with self.__measure("update") as counts:
+            i = self.__balls.index_of(ball)
+            ball.set_coordinates(x, y)
+            self.__update_ball(i)
+            counts["shots"] = self.__shot_count()
+            progress(f"[UPDATE] Ball moved to {(x, y)}")
+
+    def pocket_ball(self, ball):
+        # Remove one ball (a Ball from get_balls()) from play: its shots are dropped and
+        # shots it was blocking are validated again
+        with self.__measure("update") as counts:
+            i = self.__balls.index_of(ball)
+            ball.pocket()
+            self.__update_ball(i)
+            counts["shots"] = self.__shot_count()
+            progress("[UPDATE] Ball pocketed")
+
+    def __update_ball(self, i):
+        self.__build_index()
+        if self.__candidates is None:
             return
 
-        print("[BEST] Calculating best recommendations", end='')
-        self.__shots = get_best_shots(self.__shots)
-        print("\n[BEST] Recommended shots selected")
+        ball = self.__balls[i]
+        white = self.__white()
+        if ball.get_type() == "white" or white is None:
+            self.__recalculate_all(white)
+            return
+
+        rows = self.__candidates["ball_idx"] == i
+        if ball.is_pocketed():
+            self.__take_candidates(~rows)
+            rows = np.zeros(len(self.__candidates["ball_idx"]), dtype=bool)
+        elif rows.any():
+            batch = self.__candidate_batch(white, [i])
+            if self.__cushions is None:
+                # Every target has the same number of shots, so new ones replace the old rows in place
+                repeats = rows.sum() // len(batch["ball_idx"])
+                for key, value in self.__candidates.items():
+                    value[rows] = np.concatenate([batch[key]] * repeats)
+            else:
+                # Multi-cushion shots are pruned per position, so the new rows are added at the end
+                self.__take_candidates(~rows)
+                self.__candidates = concat_batches(self.__candidates, batch)
+                if self.__valid is not None:
+                    self.__valid = np.concatenate([self.__valid, np.ones(len(batch["ball_idx"]), dtype=bool)])
+                    self.__blocker = np.concatenate([self.__blocker, np.full(len(batch["ball_idx"]), -1)])
+                rows = self.__candidates["ball_idx"] == i
+
+        if self.__valid is not None:
+            # Shots of this ball and shots it used to block are validated from scratch
+            dirty = rows | (self.__blocker == i)
+            if dirty.any():
+                self.__valid[dirty], self.__blocker[dirty] = self.__validate(take_shots(self.__candidates, dirty))
+
+            # The rest can only become blocked by the ball in its new place
+            if not ball.is_pocketed():
+                segments, exists = shot_segments(take_shots(self.__candidates, ~dirty))
+                hit, _ = find_blocked_segments(segments, exists, [ball.get_coordinates()], 23)
+                rest = np.flatnonzero(~dirty)[hit]
+                self.__valid[rest] = False
+                self.__blocker[rest] = np.where((self.__blocker[rest] < 0) | (self.__blocker[rest] > i),
+                                                i, self.__blocker[rest])
+
+        self.__select_shots()
+
+    def __recalculate_all(self, white):
+        # Recompute every candidate shot (after the white ball moved) in the same order
+        if white is None:
+            self.__take_candidates(np.zeros(len(self.__candidates["ball_idx"]), dtype=bool))
+        else:
+            ball_idx = self.__candidates["ball_idx"]
+            if self.__cushions is None:
+                targets = ball_idx[::len(SHOT_ORDER) * len(HOLES)].tolist()
+            else:
+                # Shots of a target are consecutive, their number varies
+                targets = ball_idx[np.flatnonzero(np.diff(ball_idx, prepend=-1) != 0)].tolist()
+            self.__candidates = self.__candidate_batch(white, targets) if targets else self.__candidates
+        if self.__valid is not None:
+            self.__valid, self.__blocker = self.__validate(self.__candidates)
+        self.__select_shots()
+
+    def __candidate_batch(self, white, targets):
+        # Shots at the balls with the given indices, with the index of the target ball in "ball_idx"
+        if self.__cushions is None:
+            batch = get_shots_batch(white, self.__balls.get_centers()[targets])
+        else:
+            batch = get_rail_shots_batch(white, self.__balls.get_centers()[targets], self.__cushions)
+        batch["ball_idx"] = np.asarray(targets, dtype=np.int64)[batch["target_idx"]]
+        return batch
+
+    def __take_candidates(self, rows):
+        self.__candidates = take_shots(self.__candidates, rows)
+        if self.__valid is not None:
+            self.__valid = self.__valid[rows]
+            self.__blocker = self.__blocker[rows]
+
+    def __validate(self, batch):
+        # Full validation of candidate shots against all balls still on the table
+        # returns (valid mask, index of the first blocking ball in self.__balls or -1)
+        valid, blocker = validate_batch(batch, self.__balls.get_centers()[self.__active], 23, index=self.__index)
+        return valid, np.where(blocker >= 0, self.__active[np.maximum(blocker, 0)], -1)
+
+    def __select_shots(self):
+        # Current shots from the candidates: all of them, the valid ones or the best valid ones
+        if self.__stage == "shots":
+            self.__shot_batch = self.__candidates
+            return
+
+        self.__shot_batch = take_shots(self.__candidates, self.__valid)
+        if self.__stage == "best" and self.__shot_count():
+            batch = self.__shot_batch
+            best = rank_shots(batch["angle"], batch["length"], ShotSet(batch).get_banks(), *self.__ranking)
+            self.__shot_batch = take_shots(batch, best)
+
+    def __build_index(self):
+        # Spatial index over the balls still on the table (self.__active maps its balls to self.__balls)
+        self.__active = self.__balls.active()
+        self.__index = TableIndex(self.__balls.get_centers()[self.__active])
+
+    def __white(self):
+        # Centre of the white ball still on the table, or None
+        white = np.flatnonzero((self.__balls.get_type_codes() == BALL_TYPES.index("white"))
+                               & ~self.__balls.get_pocketed())
+        return tuple(self.__balls.get_centers()[white[0]].tolist()) if len(white) else None
+
+    def __shot_count(self):
+        return 0 if self.__shot_batch is None else len(self.__shot_batch["angle"])
 
     def print_shots(self):
         print("-----[Shots]-----")
-        for i, shot in enumerate(self.__shots, start=1):
+        for i, shot in enumerate(self.get_shots(), start=1):
             print(f"Shot {i}: length: {round(shot.get_length(),2)}, angle: {shot.get_angle()}")
 
     def get_balls_count(self):
-        return len(self.__balls)
+        # Balls still on the table
+        return len(self.__balls.active())
+
+    def get_balls(self):
+        # Balls still on the table
+        return [self.__balls[i] for i in self.__balls.active().tolist()]
+
+    def get_ball_set(self):
+        return self.__balls
+
+    def get_shots(self):
+        return [] if self.__shot_batch is None else list(ShotSet(self.__shot_batch))
+
+    def get_shot_batch(self):
+        # Current shots as arrays (see get_shots_batch, plus "ball_idx" into get_ball_set()), or None
+        return self.__shot_batch
+
+    def get_name(self):
+        return self.__name
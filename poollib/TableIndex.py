@@ -0,0 +1,162 @@
+import numpy as np
+from functools import lru_cache
+
+from .shots_calculations import HOLE_DIAMETER2
+
+# Table size in pixels after transformation (shot geometry uses the same coordinates)
+TABLE_WIDTH = 1000
+TABLE_HEIGHT = 2000
+
+# Grid cell size in pixels (two ball diameters): smaller cells give fewer candidate balls per
+# segment but more samples along it; 92 was the fastest on 16-ball racks
+CELL_SIZE = 92
+
+
+# The TableIndex class stores table-space lookup structures built once per detection:
+# a rasterized pocket zone map and a uniform grid of cells holding the balls that can block paths
+class TableIndex:
+    def __init__(self, balls, ball_radius=23, cell_size=CELL_SIZE):
+        # balls - ball centres (B, 2), ball_radius - radius used for collisions
+        self.__balls = np.asarray(balls, dtype=np.int64).reshape(-1, 2)
+        self.__block_dist = 2 * ball_radius - 2
+        self.__cell = cell_size
+        self.__width = TABLE_WIDTH
+        self.__height = TABLE_HEIGHT
+        self.__zones = pocket_zones()
+
+        # Segments are sampled every cell_size pixels, so a ball is stored in every cell
+        # within blocking distance + half a step of its centre; any sample close enough lands there
+        self.__rows = -(-self.__height // cell_size)
+        self.__cols = -(-self.__width // cell_size)
+        words = max(1, -(-len(self.__balls) // 64))
+        self.__grid = np.zeros((self.__rows, self.__cols, words), dtype=np.uint64)
+
+        reach = self.__block_dist + cell_size / 2
+        corners = np.array([[0, 0], [self.__width - 1, self.__height - 1]])
+        if len(self.__balls):
+            corners = np.array([np.minimum(corners[0], self.__balls.min(axis=0)),
+                                np.maximum(corners[1], self.__balls.max(axis=0))])
+        self.__box = corners + np.array([[-reach], [reach]])
+        for i, (x, y) in enumerate(self.__balls.tolist()):
+            x = min(max(x, 0), self.__width - 1)
+            y = min(max(y, 0), self.__height - 1)
+            c1, c2 = self.__cell_index(np.array([x - reach, x + reach]), self.__width, self.__cols)
+            r1, r2 = self.__cell_index(np.array([y - reach, y + reach]), self.__height, self.__rows)
+            self.__grid[r1:r2 + 1, c1:c2 + 1, i // 64] |= np.uint64(1 << (i % 64))
+
+        # Flat view of the grid (row-major cells) and the largest cell coordinate of a sample, in cells
+        self.__cells = self.__grid.reshape(-1, words)
+        self.__last = ((self.__width - 1) / cell_size, (self.__height - 1) / cell_size)
+
+    def get_balls(self):
+        return self.__balls
+
+    def edge_possible(self, points):
+        # True where a path starting at point is clear of the pocket zones (any shape (..., 2))
+        points = np.asarray(points)
+        x = np.clip(points[..., 0], 0, self.__width - 1).astype(np.int64)
+        y = np.clip(points[..., 1], 0, self.__height - 1).astype(np.int64)
+        return ~self.__zones[y, x]
+
+    def segment_candidates(self, segments):
+        # Balls that may block each segment, from the grid cells the segment crosses
+        # segments - (S, 2, 2) endpoints, returns bool mask (S, B)
+        segments = np.asarray(segments, dtype=np.float64).reshape(-1, 2, 2)
+        if len(segments) == 0:
+            return np.zeros((0, len(self.__balls)), dtype=bool)
+        start = segments[:, 0]
+        delta = segments[:, 1] - start
+
+        # Only the part of a segment near the balls matters (rebound points can lie far off the table)
+        t0, t1 = self.__clip_segments(start, delta)
+        inside = t0 <= t1
+        length = np.where(inside, (t1 - t0) * np.hypot(delta[:, 0], delta[:, 1]), 0)
+        steps = np.ceil(length / self.__cell).astype(np.int64)
+
+        # Sample points along all segments at once (both ends of the clipped part included),
+        # directly in cell units: first sample and step of every segment, then one product per sample
+        counts = steps + 1
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        first = (start + t0[:, None] * delta) * (1 / self.__cell)
+        step = delta * ((t1 - t0) / np.maximum(steps, 1) / self.__cell)[:, None]
+        owner = np.repeat(np.arange(len(segments)), counts)
+        k = np.arange(counts.sum()) - offsets[owner]
+        # One axis at a time: gathers of 1-D arrays are much faster than of (S, 2) rows
+        cells = np.zeros(len(owner), dtype=np.int64)
+        for axis, scale in ((0, 1), (1, self.__cols)):
+            coord = first[:, axis][owner] + k * step[:, axis][owner]
+            cells += np.clip(coord, 0, self.__last[axis]).astype(np.int64) * scale
+
+        words = np.bitwise_or.reduceat(self.__cells[cells], offsets, axis=0)
+        bits = np.unpackbits(words.astype("<u8").view(np.uint8), axis=1, bitorder="little")
+        return bits[:, :len(self.__balls)].astype(bool) & inside[:, None]
+
+    def blocked_segments(self, segments):
+        # Same result as is_shot_blocked for each segment, but distances are only
+        # computed for balls found in the crossed cells
+        # returns (blocked mask (S,), index of the first blocking ball or -1 (S,))
+        segments = np.asarray(segments, dtype=np.int64).reshape(-1, 2, 2)
+        seg_idx, ball_idx = np.nonzero(self.segment_candidates(segments))
+
+        # Endpoint and ball coordinates as separate columns (1-D gathers are much faster than of rows)
+        x1, y1 = segments[:, 0, 0][seg_idx], segments[:, 0, 1][seg_idx]
+        x2, y2 = segments[:, 1, 0][seg_idx], segments[:, 1, 1][seg_idx]
+        bx, by = self.__balls[:, 0][ball_idx], self.__balls[:, 1][ball_idx]
+        dx, dy = x2 - x1, y2 - y1
+        length2 = dx * dx + dy * dy
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = ((bx - x1) * dx + (by - y1) * dy) / length2
+        t = np.where(length2 == 0, 0, np.clip(t, 0, 1))
+        dist = np.hypot(bx - (x1 + t * dx), by - (y1 + t * dy))
+
+        # A ball never blocks a segment that starts or ends on it
+        on_end = ((bx == x1) & (by == y1)) | ((bx == x2) & (by == y2))
+        hit = (dist < self.__block_dist) & ~on_end
+
+        blocked = np.zeros(len(segments), dtype=bool)
+        blocked[seg_idx[hit]] = True
+        blocker = np.full(len(segments), -1, dtype=np.int64)
+        # Assign in reverse so the lowest ball index wins
+        blocker[seg_idx[hit][::-1]] = ball_idx[hit][::-1]
+        return blocked, blocker
+
+    def __clip_segments(self, start, delta):
+        # Liang-Barsky clipping of segments to the box around all balls, extended by the reach
+        # of a ball; returns the parameter range [t0, t1] of each segment inside the box
+        t0 = np.zeros(len(start))
+        t1 = np.ones(len(start))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for axis in (0, 1):
+                low = self.__box[0, axis] - start[:, axis]
+                high = self.__box[1, axis] - start[:, axis]
+                d = delta[:, axis]
+                ta = low / d
+                tb = high / d
+                t0 = np.where(d > 0, np.maximum(t0, ta), np.where(d < 0, np.maximum(t0, tb), t0))
+                t1 = np.where(d > 0, np.minimum(t1, tb), np.where(d < 0, np.minimum(t1, ta), t1))
+                outside = (d == 0) & ((low > 0) | (high < 0))
+                t1 = np.where(outside | ~np.isfinite(d), -1, t1)
+        return t0, t1
+
+    def __cell_index(self, coord, size, cells):
+        # Grid cell of each coordinate, points outside the table go to the border cells
+        # (monotonic in coord, so balls and samples always agree on their cells)
+        cell = (np.clip(coord, 0, size - 1) * (1 / self.__cell)).astype(np.int64)
+        return np.clip(cell, 0, cells - 1)
+
+
+# Rasterized pocket zones used by is_edge_possible, one bool per pixel (True inside a zone)
+# Built once and shared between TableIndex objects
+@lru_cache(maxsize=1)
+def pocket_zones():
+    x = np.arange(TABLE_WIDTH)
+    y = np.arange(TABLE_HEIGHT)
+    left = x < HOLE_DIAMETER2
+    right = x > TABLE_WIDTH - HOLE_DIAMETER2
+    top = y < HOLE_DIAMETER2
+    middle = (TABLE_HEIGHT // 2 - HOLE_DIAMETER2 < y) & (y < TABLE_HEIGHT // 2 + HOLE_DIAMETER2)
+    bottom = y > TABLE_HEIGHT - HOLE_DIAMETER2
+
+    zones = (top | middle | bottom)[:, None] & (left | right)[None, :]
+    zones.flags.writeable = False
+    return zones
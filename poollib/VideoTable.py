@@ -0,0 +1,183 @@
+import cv2 as cv
+import numpy as np
+
+from .transform import find_perspective, warp
+from .detect import find_circles, remove_table, table_color_range, pocket_mask, HOUGH_PARAMS
+from .Ball import Ball
+from .categorize import categorize_batch, BATCH_PARAMS
+from .Calibration import Calibration
+from .Table import Table
+from .instrument import progress
+
+# Frames are compared on thumbnails downscaled by this factor (one pixel = DIFF_SCALE^2 block)
+DIFF_SCALE = 8
+
+# Mean gray level change of a thumbnail pixel that counts as a change (above compression noise)
+DIFF_THRESHOLD = 20
+
+# Changed areas are searched again with this margin, so a ball overlapping their edge is found whole
+REGION_MARGIN = 60
+
+
+# The VideoTable class reads a video file or a numbered frame sequence ("frames/%04d.jpg")
+# of a fixed camera and produces a Table for every frame in which something changed.
+# Balls are tracked between frames: only changed regions are detected and categorized again,
+# balls in unchanged regions are carried over with their types and colors.
+class VideoTable:
+    def __init__(self, source, calibration=None, raw=False):
+        # source      - anything cv.VideoCapture accepts (video file, image sequence pattern)
+        # calibration - Calibration profile or path; computed from the first frame if None
+        # raw         - frames need perspective correction (uses the calibrated matrix if available)
+        if isinstance(calibration, str):
+            calibration = Calibration.load(calibration)
+        self.__source = source
+        self.__calibration = calibration
+        self.__raw = raw
+        self.__matrix = calibration.get_matrix() if calibration is not None else None
+
+        # State of the last processed frame
+        self.__thumb = None
+        self.__frame = None
+        self.__masked = None
+        self.__balls = []
+
+        # Frame statistics
+        self.__read = 0
+        self.__skipped = 0
+
+    def frames(self):
+        # Generator of (frame number, Table with detected and categorized balls) for changed frames
+        capture = cv.VideoCapture(self.__source)
+        if not capture.isOpened():
+            raise Exception(f"[VIDEO] Failed to open {self.__source}")
+
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                number = self.__read
+                self.__read += 1
+
+                # Cheap check on the raw frame before any warping or detection
+                thumb = thumbnail(frame)
+                if self.__thumb is not None and not changed_blocks(self.__thumb, thumb).any():
+                    self.__skipped += 1
+                    continue
+                self.__thumb = thumb
+
+                yield number, self.__update(self.__prepare(frame))
+        finally:
+            capture.release()
+
+        progress(f"[VIDEO] {self.__read} frames read, {self.__skipped} unchanged frames skipped")
+
+    def get_frame_counts(self):
+        # (frames read, frames skipped as unchanged)
+        return self.__read, self.__skipped
+
+    def get_balls(self):
+        return list(self.__balls)
+
+    def __prepare(self, frame):
+        # Top-down view of a frame
+        if not self.__raw:
+            return frame
+        if self.__matrix is None:
+            self.__matrix = find_perspective(frame)
+        return warp(frame, self.__matrix)
+
+    def __update(self, frame):
+        # Detect balls in a changed frame, reusing the previous frame where nothing changed
+        if self.__frame is None:
+            # First frame: full detection, also the calibration source for later frames
+            if self.__calibration is None:
+                hsv = cv.cvtColor(frame, cv.COLOR_BGR2HSV)
+                self.__calibration = Calibration(self.__matrix, table_color_range(hsv), pocket_mask(hsv))
+            region = (0, 0, frame.shape[1], frame.shape[0])
+            self.__balls, self.__masked = self.__detect_region(frame, region, [])
+        else:
+            self.__masked = self.__masked.copy()
+            for region in changed_regions(self.__frame, frame):
+                self.__balls, self.__masked = self.__detect_region(frame, region, self.__balls)
+
+        self.__frame = frame
+        table = Table(frame, calibration=self.__calibration)
+        table.set_balls(self.__balls, self.__masked)
+        return table
+
+    def __detect_region(self, frame, region, balls):
+        # Replaces the balls inside region (x1, y1, x2, y2) with the ones detected there now
+        # returns (balls, ball-only image with the region updated)
+        x1, y1, x2, y2 = region
+        height, width = frame.shape[:2]
+        cx1, cy1 = max(0, x1 - REGION_MARGIN), max(0, y1 - REGION_MARGIN)
+        cx2, cy2 = min(width, x2 + REGION_MARGIN), min(height, y2 + REGION_MARGIN)
+
+        crop = frame[cy1:cy2, cx1:cx2]
+        pockets = self.__calibration.get_pocket_mask()[cy1:cy2, cx1:cx2]
+        circles, table_mask = find_circles(crop, self.__calibration.get_color_range(), pockets)
+        masked = self.__masked if self.__masked is not None else np.zeros_like(frame)
+        masked[y1:y2, x1:x2] = remove_table(crop, table_mask)[y1 - cy1:y2 - cy1, x1 - cx1:x2 - cx1]
+
+        def inside(x, y):
+            return x1 <= x < x2 and y1 <= y < y2
+
+        kept = [ball for ball in balls if not inside(*ball.get_coordinates())]
+
+        # New balls: centres inside the region, not closer to a kept ball than Hough allows
+        centers = []
+        if circles is not None:
+            for x, y, _ in np.round(circles[0, :]).astype("int").tolist():
+                x, y = x + cx1, y + cy1
+                near = any(np.hypot(x - bx, y - by) < HOUGH_PARAMS["minDist"]
+                           for bx, by in (ball.get_coordinates() for ball in kept))
+                if inside(x, y) and not near:
+                    centers.append((x, y))
+
+        # Categorize only the new balls, on the ball-only crop
+        if centers:
+            crop_masked = remove_table(crop, table_mask)
+            local = np.array(centers) - [cx1, cy1]
+            for (x, y), (ball_type, color) in zip(centers, categorize_batch(local, crop_masked, **BATCH_PARAMS)):
+                ball = Ball(x, y)
+                ball.set_category(ball_type, color)
+                kept.append(ball)
+
+        return kept, masked
+
+
+#### Thumbnail ####
+# Small grayscale version of a frame used for change detection
+def thumbnail(frame):
+    height, width = frame.shape[:2]
+    gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+    size = (max(1, width // DIFF_SCALE), max(1, height // DIFF_SCALE))
+    return cv.resize(gray, size, interpolation=cv.INTER_AREA)
+
+
+#### Changed blocks ####
+# Boolean map of thumbnail pixels that differ between two thumbnails
+def changed_blocks(previous, current):
+    if previous.shape != current.shape:
+        return np.ones(current.shape, dtype=bool)
+    return cv.absdiff(previous, current) > DIFF_THRESHOLD
+
+
+#### Changed regions ####
+# Bounding boxes (x1, y1, x2, y2) in frame pixels of the areas that changed between two frames
+def changed_regions(previous, current):
+    blocks = changed_blocks(thumbnail(previous), thumbnail(current)).astype(np.uint8)
+    if not blocks.any():
+        return []
+
+    # Grow changes by one block so touching spots become one region
+    blocks = cv.dilate(blocks, np.ones((3, 3), np.uint8))
+    count, _, stats, _ = cv.connectedComponentsWithStats(blocks)
+
+    height, width = current.shape[:2]
+    regions = []
+    for x, y, w, h, _ in stats[1:count].tolist():
+        regions.append((x * DIFF_SCALE, y * DIFF_SCALE,
+                        min(width, (x + w) * DIFF_SCALE), min(height, (y + h) * DIFF_SCALE)))
+    return regions
@@ -0,0 +1,7 @@
+# Import-time budget of the package: short-lived workers and one-shot CLI calls import
+# poollib.Table on every start, so importing it may take at most IMPORT_BUDGET_MS on top of
+# NumPy and OpenCV, and must not load any module in LAZY_IMPORTS. Those are imported inside
+# the functions that need them (HEIC decoding, scikit-learn KMeans, Table.show).
+# test.py checks both in a fresh interpreter.
+IMPORT_BUDGET_MS = 50
+LAZY_IMPORTS = ("tkinter", "sklearn", "scipy", "joblib", "PIL", "pillow_heif")
@@ -0,0 +1,70 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+# Bump when detection or categorization code changes in a way that alters results
+CACHE_VERSION = 2
+
+
+#### CACHE KEY ####
+# Content address of an image and the parameters used to analyze it
+# img    - image as a NumPy array (the one passed to detection)
+# params - JSON-serializable detection and categorization parameters
+def cache_key(img, params):
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    digest.update(str((img.shape, img.dtype.str)).encode())
+    digest.update(np.ascontiguousarray(img).data)
+    return digest.hexdigest()
+
+
+#### LOAD ####
+# Reads a cached detection, returns (centers (B, 2), type codes, colors (B, 3), table mask) or None on a miss
+# An entry written with other parameters is removed and treated as a miss
+def load_detection(cache_dir, key, params):
+    path = _entry_path(cache_dir, key)
+    try:
+        with np.load(path) as entry:
+            stored_params = json.loads(str(entry["params"]))
+            centers = entry["centers"].astype(np.int64)
+            type_codes = entry["types"].astype(np.int8)
+            colors = entry["colors"]
+            mask_shape = tuple(entry["mask_shape"])
+            packed_mask = entry["mask"]
+    except (OSError, KeyError, ValueError):
+        return None
+
+    if stored_params != json.loads(json.dumps(params)):
+        os.remove(path)
+        return None
+
+    mask_size = int(np.prod(mask_shape))
+    table_mask = np.unpackbits(packed_mask, count=mask_size).reshape(mask_shape) * np.uint8(255)
+    return centers, type_codes, colors, table_mask
+
+
+#### SAVE ####
+# Stores detected ball centres with their type codes (see BALL_TYPES) and colors, and the table mask
+# (1 bit per pixel) so the ball-only image can be rebuilt without detection
+def save_detection(cache_dir, key, params, centers, type_codes, colors, table_mask):
+    path = _entry_path(cache_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write to a temporary file first so parallel workers never read half an entry
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        np.savez_compressed(
+            file,
+            params=np.array(json.dumps(params, sort_keys=True)),
+            centers=np.asarray(centers, dtype=np.int32).reshape(-1, 2),
+            types=np.asarray(type_codes, dtype=np.int8),
+            colors=np.asarray(colors, dtype=np.uint8).reshape(-1, 3),
+            mask_shape=np.array(table_mask.shape),
+            mask=np.packbits(table_mask > 0),
+        )
+    os.replace(tmp_path, path)
+
+
+def _entry_path(cache_dir, key):
+    return os.path.join(cache_dir, key[:2], f"{key}.npz")
@@ -1,15 +1,20 @@
 import cv2 as cv
 import numpy as np
-from sklearn.cluster import KMeans
+
+# Parameters of the batched classifier used by Table.categorize_balls
+BATCH_PARAMS = {"ball_radius": 23, "n_clusters": 4, "seed": 42}
 
 
 def categorize(x, y, img):
     ball_radius = 23
 
+    # Work only on a small patch around the ball (clipped at the image border)
+    patch, (px, py) = ball_patch(x, y, img, ball_radius)
+
     # Create a circular mask for the detected ball
-    ball_mask = np.zeros(img.shape[:2], dtype=np.uint8)
-    cv.circle(ball_mask, (x, y), ball_radius, 255, -1)  # white mask over the ball area
-    isolated_ball = cv.bitwise_and(img, img, mask=ball_mask)
+    ball_mask = np.zeros(patch.shape[:2], dtype=np.uint8)
+    cv.circle(ball_mask, (px, py), ball_radius, 255, -1)  # white mask over the ball area
+    isolated_ball = cv.bitwise_and(patch, patch, mask=ball_mask)
 
     # Calculate the dominant color and its ratio
     color_hsv, color_bgr, ratio = calculate_color(isolated_ball)
@@ -21,7 +26,227 @@ def categorize(x, y, img):
     return ball_type, color_bgr[0, 0].tolist()
 
 
+def ball_patch(x, y, img, ball_radius):
+    # Crop the square around a ball, returns the patch and the ball centre inside it
+    height, width = img.shape[:2]
+    x1 = max(0, int(x) - ball_radius - 1)
+    y1 = max(0, int(y) - ball_radius - 1)
+    x2 = min(width, int(x) + ball_radius + 2)
+    y2 = min(height, int(y) + ball_radius + 2)
+    return img[y1:y2, x1:x2], (int(x) - x1, int(y) - y1)
+
+
+def categorize_batch(centers, img, ball_radius=23, n_clusters=4, seed=42):
+    # Categorize all balls at once: same pixels, clusters and statistics as categorize(), but the
+    # pixels of every ball are clustered together with a batched NumPy k-means instead of one KMeans per ball
+    # centers - ball centres (B, 2)
+    # returns a list of (ball type, color in BGR), one per ball
+    centers = np.asarray(centers, dtype=np.int64).reshape(-1, 2)
+    if len(centers) == 0:
+        return []
+
+    # Gather a square patch around every ball with one indexing operation
+    size = 2 * ball_radius + 3
+    disk = np.zeros((size, size), dtype=np.uint8)
+    cv.circle(disk, (ball_radius + 1, ball_radius + 1), ball_radius, 255, -1)
+
+    height, width = img.shape[:2]
+    offsets = np.arange(size) - ball_radius - 1
+    xs = centers[:, 0, None] + offsets
+    ys = centers[:, 1, None] + offsets
+    inside = ((ys >= 0) & (ys < height))[:, :, None] & ((xs >= 0) & (xs < width))[:, None, :]
+    patches = img[np.clip(ys, 0, height - 1)[:, :, None], np.clip(xs, 0, width - 1)[:, None, :]]
+
+    # Convert all patches to HSV at once and keep bright, saturated pixels inside each ball
+    hsv = cv.cvtColor(patches.reshape(-1, size, 3), cv.COLOR_BGR2HSV).reshape(len(centers), -1, 3)
+    mask = (inside & (disk > 0)).reshape(len(centers), -1) & (hsv[..., 1] > 5) & (hsv[..., 2] > 5)
+    groups, _ = np.nonzero(mask)
+
+    clusters, counts = kmeans_batch(hsv[mask].T.astype(np.float64), groups, len(centers), n_clusters, seed)
+
+    # Same statistics as calculate_color, for every ball at once
+    rows = np.arange(len(centers))
+    saturations = clusters[..., 1]
+    values = clusters[..., 2]
+    color_idx = np.argmax(saturations, axis=1)
+    white_idx = np.argmax(values - saturations, axis=1)
+
+    color_count = counts[rows, color_idx]
+    white_count = counts[rows, white_idx]
+    ratio = np.where(white_count > 0, color_count / np.maximum(white_count, 1), np.inf)
+
+    # Adjust ratio if the “white” cluster isn’t truly white
+    white = clusters[rows, white_idx]
+    ratio = np.where((white[:, 2] < 200) & (white[:, 1] > 80), 10.0, ratio)
+
+    # Most saturated cluster, ties resolved in order of cluster size
+    order = np.argsort(-counts, axis=1, kind="stable")
+    dominant = clusters[rows[:, None], order].astype(int)
+    color_hsv = dominant[rows, np.argmax(dominant[..., 1], axis=1)]
+    color_bgr = cv.cvtColor(color_hsv.astype(np.uint8).reshape(-1, 1, 3), cv.COLOR_HSV2BGR).reshape(-1, 3)
+
+    return [(calculate_type(hsv_color, r), bgr.tolist())
+            for hsv_color, r, bgr in zip(color_hsv.tolist(), ratio.tolist(), color_bgr)]
+
+
+def kmeans_batch(points, groups, n_groups, n_clusters, seed, max_iter=300, tol=1e-4):
+    # Lloyd's k-means run for many point sets at once, following scikit-learn's KMeans step by step
+    # (k-means++ seeding with the draws of a fresh RandomState(seed) for every set, centred data,
+    # the same tolerance, stop rule and empty cluster relocation), so every set gets the clusters
+    # KMeans(n_clusters, n_init="auto", random_state=seed).fit gives for it alone
+    # (bench.py --check compares the results with categorize())
+    # points - (3, M) channels of the pixels of all sets, groups - (M,) sorted set index of every pixel
+    # returns cluster centres (n_groups, K, 3) and cluster sizes (n_groups, K)
+    # (a set with fewer points than clusters gets zero centres and sizes)
+    clusters = np.zeros((n_groups, n_clusters, 3))
+    counts = np.zeros((n_groups, n_clusters), dtype=np.int64)
+    starts = np.searchsorted(groups, np.arange(n_groups), side="left")
+    sizes = np.searchsorted(groups, np.arange(n_groups), side="right") - starts
+    sets = np.flatnonzero(sizes >= n_clusters)
+    if len(sets) == 0:
+        return clusters, counts
+
+    # Pad every set to the largest one: x (S, N, 3), valid (S, N) marks the real points
+    n = sizes[sets]
+    valid = np.arange(n.max()) < n[:, None]
+    index = starts[sets][:, None] + np.minimum(np.arange(n.max()), n[:, None] - 1)
+    x = np.where(valid[..., None], points.T[index], 0)
+
+    # Centre every set on its mean; the tolerance scales with the mean variance of the set
+    means = x.sum(axis=1) / n[:, None]
+    tolerances = np.mean(np.where(valid[..., None], (x - means[:, None]) ** 2, 0).sum(axis=1) / n[:, None],
+                         axis=1) * tol
+    x = np.where(valid[..., None], x - means[:, None], 0)
+    xt = np.ascontiguousarray(x.transpose(0, 2, 1))
+
+    # Every set draws the same random numbers, as each KMeans would start from RandomState(seed)
+    random_state = np.random.RandomState(seed)
+    first = random_state.random_sample()
+    draws = random_state.uniform(size=(n_clusters - 1, 2 + int(np.log(n_clusters))))
+    centres = _kmeans_plusplus(x, xt, valid, n, first, draws)
+
+    # Lloyd iterations of all sets together, a set stops updating once it has converged
+    rows = np.arange(len(sets))
+    flat, set_of = x[valid], np.repeat(rows, n)
+    labels = np.full(valid.shape, -1)
+    labels_old = labels.copy()
+    active = np.ones(len(sets), dtype=bool)
+    strict = np.zeros(len(sets), dtype=bool)
+    for _ in range(max_iter):
+        running = np.flatnonzero(active)
+        labels = labels.copy()
+        labels[running] = _nearest(xt[running], centres[running])
+        sizes, sums = _cluster_sums(flat, set_of, labels[valid], len(sets), n_clusters)
+        for s in np.flatnonzero(active & (sizes == 0).any(axis=1)):
+            _relocate_empty(x[s, :n[s]], labels[s, :n[s]], centres[s], sizes[s], sums[s])
+        updated = _average(sums, sizes)
+        shift = ((updated - centres) ** 2).sum(axis=(1, 2))
+
+        centres = np.where(active[:, None, None], updated, centres)
+        changed = ((labels != labels_old) & valid).any(axis=1)
+        strict |= active & ~changed
+        active &= changed & (shift > tolerances)
+        labels_old = labels
+        if not active.any():
+            break
+
+    # Sets stopped by the tolerance (or max_iter) are labelled again with their final centres
+    labels = np.where(strict[:, None], labels, _nearest(xt, centres))
+    counts[sets] = np.bincount(set_of * n_clusters + labels[valid],
+                               minlength=len(sets) * n_clusters).reshape(len(sets), n_clusters)
+    clusters[sets] = centres + means[:, None]
+    return clusters, counts
+
+
+def _kmeans_plusplus(x, xt, valid, n, first, draws):
+    # scikit-learn's greedy k-means++ on all padded sets at once, with the same operations so the
+    # same centres are picked: each new centre is the best of a few candidates drawn with
+    # probability proportional to the squared distance from the chosen centres
+    # x - (S, N, 3) padded points, xt - the same as (S, 3, N)
+    # first - draw picking the first centre, draws - (K - 1, trials) uniform draws of the candidates
+    rows = np.arange(len(x))
+    norms = np.einsum("snj,snj->sn", x, x)
+
+    # First centre: RandomState.choice(n, p=1/n), the number of cdf values not above the draw
+    cdf = np.cumsum(np.where(valid, 1.0 / n[:, None], 0), axis=1)
+    cdf /= cdf[rows, n - 1][:, None]
+    chosen = [((cdf <= first) & valid).sum(axis=1)]
+    closest = np.where(valid, _sq_dist(x[rows, chosen[0]][:, None], xt, norms)[:, 0], 0)
+    potential = closest.sum(axis=1)
+    for trial in draws:
+        # Candidates: searchsorted of the draws in the cumulative distances (padding never counts)
+        cumulative = np.cumsum(closest, axis=1)
+        below = (cumulative[:, None, :] < (trial[None, :] * potential[:, None])[..., None]) & valid[:, None]
+        candidates = np.minimum(below.sum(axis=2), n[:, None] - 1)
+
+        dist = np.minimum(closest[:, None], _sq_dist(x[rows[:, None], candidates], xt, norms))
+        dist = np.where(valid[:, None], dist, 0)
+        potentials = dist.sum(axis=2)
+        best = np.argmin(potentials, axis=1)
+        closest, potential = dist[rows, best], potentials[rows, best]
+        chosen.append(candidates[rows, best])
+    return x[rows[:, None], np.stack(chosen, axis=1)]
+
+
+def _sq_dist(centres, xt, norms):
+    # Squared distances from centres (S, C, 3) to the points xt (S, 3, N) with squared norms (S, N)
+    dist = -2 * (centres @ xt)
+    dist += np.einsum("scj,scj->sc", centres, centres)[..., None]
+    dist += norms[:, None, :]
+    return np.maximum(dist, 0, out=dist)
+
+
+def _nearest(xt, centres):
+    # Index of the nearest centre for every point (first one on ties), xt (S, 3, N), centres (S, K, 3)
+    # Distances are |c|^2 - 2 x.c from one matrix product, rounded like scikit-learn's, so
+    # points at the same distance from two centres (frequent with integer pixels) go the same way
+    dist = np.einsum("skj,skj->sk", centres, centres)[..., None] - 2 * (centres @ xt)
+    # Running minimum over the few centres (much faster than argmin along a short axis)
+    nearest = np.zeros(dist.shape[::2], dtype=np.int64)
+    best = dist[:, 0].copy()
+    for k in range(1, dist.shape[1]):
+        np.copyto(nearest, k, where=dist[:, k] < best)
+        np.minimum(best, dist[:, k], out=best)
+    return nearest
+
+
+def _cluster_sums(x, set_of, labels, n_sets, n_clusters):
+    # Cluster sizes (S, K) and sums of their points (S, K, 3)
+    slot = set_of * n_clusters + labels
+    size = n_sets * n_clusters
+    sizes = np.bincount(slot, minlength=size).reshape(n_sets, n_clusters)
+    sums = np.stack([np.bincount(slot, weights=channel, minlength=size) for channel in x.T], axis=1)
+    return sizes, sums.reshape(n_sets, n_clusters, 3)
+
+
+def _average(sums, sizes):
+    # Cluster means from their sums; as in scikit-learn, a cluster still empty gets the centre of
+    # the biggest cluster of its set (or its plain sum when it comes before it, not yet averaged)
+    means = sums * (1.0 / np.maximum(sizes, 1))[..., None]
+    biggest = np.argmax(sizes, axis=1)[:, None]
+    rows = np.arange(len(sizes))[:, None]
+    stand_in = np.where((np.arange(sizes.shape[1]) < biggest)[..., None], sums[rows, biggest], means[rows, biggest])
+    return np.where(sizes[..., None] > 0, means, stand_in)
+
+
+def _relocate_empty(x, labels, centres, sizes, sums):
+    # Moves the points farthest from their centres into the empty clusters of one set
+    # (in place, as scikit-learn does; labels are left as they are)
+    empty = np.flatnonzero(sizes == 0)
+    distances = ((x - centres[labels]) ** 2).sum(axis=1)
+    if distances.max() == 0:
+        return
+    far = np.argpartition(distances, -len(empty))[:-len(empty) - 1:-1]
+    for cluster, point in zip(empty, far):
+        sums[labels[point]] -= x[point]
+        sums[cluster] = x[point]
+        sizes[cluster] = 1
+        sizes[labels[point]] -= 1
+
+
 def calculate_color(img):
+    from sklearn.cluster import KMeans
+
     # Convert from BGR to HSV color space
     hsv = cv.cvtColor(img, cv.COLOR_BGR2HSV)
     pixels = hsv.reshape(-1, 3)
@@ -1,39 +1,128 @@
 import cv2 as cv
 import numpy as np
+from fractions import Fraction
 
+from .instrument import progress
 
-def detect_balls(img):
-    print("\033[1m-----[Detect Balls]-----\033[0m")
+# Hough Transform parameters for ball detection
+HOUGH_PARAMS = {
+    "dp": 1.3,              # accumulator resolution (1.0 = same as input, >1 = smaller)
+    "minDist": 45,          # minimum distance between detected circle centers
+    "param1": 150,          # upper threshold for Canny edge detector
+    "param2": 15,           # detection threshold (lower = more noise)
+    "minRadius": 18,        # minimum ball radius
+    "maxRadius": 35,        # maximum ball radius
+}
+
+# Coarse-to-fine detection: the coarse Hough pass runs on the mask downscaled by this factor
+PYRAMID_SCALE = 2
+
+# Extra pixels around a ball (beyond maxRadius) in the full resolution refinement window
+PYRAMID_MARGIN = 8
+
+
+def detect_balls(img, color_range=None, pockets=None, pyramid=False):
+    circles, table_mask = find_circles(img, color_range, pockets, pyramid)
+    return circles, remove_table(img, table_mask)
+
+
+def find_circles(img, color_range=None, pockets=None, pyramid=False):
+    # Hough detection of the balls, returns (circles, table mask used for detection)
+    # color_range, pockets - table HSV range and pocket mask of a calibrated rig (found in the image if None)
+    # pyramid - coarse-to-fine detection (see hough_pyramid)
+    progress("\033[1m-----[Detect Balls]-----\033[0m")
 
     # Load image
     if img is None:
         raise Exception(f"\033[31m[DB 1/4!!!]\033[0m Invalid image")
 
-    print(f"\033[32m[DB 1/4]\033[0m Image loaded successfully")
+    progress(f"\033[32m[DB 1/4]\033[0m Image loaded successfully")
 
     # Detect balls using the Hough Transform
-    table_mask = create_mask(img)
+    table_mask = create_mask(img, color_range, pockets)
+
+    progress(f"\033[32m[DB 3/4]\033[0m Detecting balls...")
+    if pyramid:
+        return hough_pyramid(table_mask), table_mask
 
-    print(f"\033[32m[DB 3/4]\033[0m Detecting balls...")
     circles = cv.HoughCircles(
         table_mask,             # input image (grayscale)
         cv.HOUGH_GRADIENT,      # detection method
-        dp=1.3,                 # accumulator resolution (1.0 = same as input, >1 = smaller)
-        minDist=45,             # minimum distance between detected circle centers
-        param1=150,             # upper threshold for Canny edge detector
-        param2=15,              # detection threshold (lower = more noise)
-        minRadius=18,           # minimum ball radius
-        maxRadius=35            # maximum ball radius
+        **HOUGH_PARAMS
+    )
+    return circles, table_mask
+
+
+def hough_pyramid(table_mask, scale=PYRAMID_SCALE):
+    # Coarse-to-fine HoughCircles: candidates are found on a downscaled mask, then each one is
+    # detected again with the full resolution parameters in a small window around it.
+    # Window origins are multiples of the accumulator period (13 px for dp=1.3), so the window
+    # accumulator lines up with the full-image one and centres match full-image detection.
+    # returns circles in the HoughCircles format (1, N, 3) or None
+    height, width = table_mask.shape[:2]
+    small = cv.resize(table_mask, (width // scale, height // scale), interpolation=cv.INTER_AREA)
+    candidates = cv.HoughCircles(
+        small,
+        cv.HOUGH_GRADIENT,
+        dp=HOUGH_PARAMS["dp"],
+        minDist=HOUGH_PARAMS["minDist"] / scale,
+        param1=HOUGH_PARAMS["param1"],
+        param2=HOUGH_PARAMS["param2"] / scale,      # votes scale with the circumference
+        minRadius=HOUGH_PARAMS["minRadius"] // scale,
+        maxRadius=-(-HOUGH_PARAMS["maxRadius"] // scale)
     )
+    if candidates is None:
+        return None
 
-    balls_only = cv.bitwise_and(img, img, mask=cv.bitwise_not(table_mask))
-    return circles, balls_only
+    period = Fraction(str(HOUGH_PARAMS["dp"])).numerator
+    half = HOUGH_PARAMS["maxRadius"] + PYRAMID_MARGIN
+    circles = []
+    for x, y, _ in candidates[0] * scale:
+        x1 = max(0, (int(x) - half) // period * period)
+        y1 = max(0, (int(y) - half) // period * period)
+        x2 = min(width, int(x) + half + 1)
+        y2 = min(height, int(y) + half + 1)
 
+        found = cv.HoughCircles(table_mask[y1:y2, x1:x2], cv.HOUGH_GRADIENT, **HOUGH_PARAMS)
+        if found is None:
+            continue
 
-def create_mask(img):
-    print(f"\033[32m[DB 2/4]\033[0m Creating table mask")
+        # Keep the circle closest to the candidate, skip it if another candidate found it already
+        found = found[0] + np.float32([x1, y1, 0])
+        circle = found[np.argmin(np.hypot(found[:, 0] - x, found[:, 1] - y))]
+        if not any(np.array_equal(circle[:2], other[:2]) for other in circles):
+            circles.append(circle)
+
+    return np.array([circles], dtype=np.float32) if circles else None
+
+
+def remove_table(img, table_mask):
+    # Keep only the pixels outside the table mask (the balls)
+    return cv.bitwise_and(img, img, mask=cv.bitwise_not(table_mask))
+
+
+def create_mask(img, color_range=None, pockets=None):
+    progress(f"\033[32m[DB 2/4]\033[0m Creating table mask")
     hsv = cv.cvtColor(img, cv.COLOR_BGR2HSV)
+    if color_range is None:
+        color_range = table_color_range(hsv)
+    lower_color, upper_color = color_range
+
+    # Create and clean the mask
+    table_mask = cv.inRange(hsv, lower_color, upper_color)
+    kernel = np.ones((5, 5), np.uint8)
+    table_mask = cv.morphologyEx(table_mask, cv.MORPH_CLOSE, kernel)
+    table_mask = cv.morphologyEx(table_mask, cv.MORPH_OPEN, kernel)
+
+    # Remove pockets from the mask
+    if pockets is None:
+        pockets = pocket_mask(hsv)
+    table_mask = cv.bitwise_or(table_mask, pockets)
+    return table_mask
 
+
+def table_color_range(hsv):
+    # HSV range of the table cloth, returns (lower, upper)
     # Sample the table color (average of 4 points)
     pixel_color1 = np.uint8([[hsv[2, 500]]])
     pixel_color2 = np.uint8([[hsv[1998, 500]]])
@@ -45,16 +134,7 @@ def create_mask(img):
     # Define HSV range for the table color
     lower_color = np.array([pixel_color[0][0][0] - 7, 60, 60])
     upper_color = np.array([pixel_color[0][0][0] + 7, 255, 255])
-
-    # Create and clean the mask
-    table_mask = cv.inRange(hsv, lower_color, upper_color)
-    kernel = np.ones((5, 5), np.uint8)
-    table_mask = cv.morphologyEx(table_mask, cv.MORPH_CLOSE, kernel)
-    table_mask = cv.morphologyEx(table_mask, cv.MORPH_OPEN, kernel)
-
-    # Remove pockets from the mask
-    table_mask = cv.bitwise_or(table_mask, pocket_mask(hsv))
-    return table_mask
+    return lower_color, upper_color
 
 
 def calculate_white_percent(img):
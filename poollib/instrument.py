@@ -0,0 +1,95 @@
+import json
+import time
+import contextlib
+
+# Progress messages of the pipeline stages (banners, "[DETECT] ..." lines).
+# Batch workers and services turn them off, so no terminal I/O happens on the hot path.
+VERBOSE = True
+
+
+#### PROGRESS ####
+# Prints a progress message if progress output is enabled
+def progress(message):
+    if VERBOSE:
+        print(message)
+
+
+# Enables or disables progress messages of all modules
+def set_verbose(verbose):
+    global VERBOSE
+    VERBOSE = verbose
+
+
+# Disables progress messages for the enclosed code
+@contextlib.contextmanager
+def quiet():
+    verbose = VERBOSE
+    set_verbose(False)
+    try:
+        yield
+    finally:
+        set_verbose(verbose)
+
+
+#### STAGE ####
+# Measures one pipeline stage and passes a record to sink (nothing is measured if sink is None):
+# {"table": name, "stage": stage name, "seconds": wall time, "counts": {...}, "peak_bytes": ...}
+# sink   - any callable taking the record (list.append, jsonl_sink(file), print_sink, ...)
+# memory - record the tracemalloc peak of the stage (peak_bytes is None otherwise)
+# yields the counts dict, filled in by the stage (e.g. {"balls": 12})
+@contextlib.contextmanager
+def stage(sink, table, name, memory=False):
+    counts = {}
+    if sink is None:
+        yield counts
+        return
+
+    tracing = False
+    if memory:
+        import tracemalloc
+        tracing = not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    try:
+        yield counts
+    finally:
+        seconds = time.perf_counter() - start
+        peak = None
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            if tracing:
+                tracemalloc.stop()
+        sink({"table": table, "stage": name, "seconds": seconds, "counts": counts, "peak_bytes": peak})
+
+
+#### SINKS ####
+# Sink writing one JSON line per stage record
+def jsonl_sink(file):
+    def sink(record):
+        file.write(json.dumps(record) + "\n")
+    return sink
+
+
+# Sink printing a short line per stage record
+def print_sink(record):
+    counts = ", ".join(f"{key}: {value}" for key, value in record["counts"].items())
+    memory = f", peak {record['peak_bytes'] / 2 ** 20:.1f} MB" if record["peak_bytes"] is not None else ""
+    print(f"[STAGE] {record['table']} {record['stage']}: {record['seconds'] * 1000:.1f} ms{memory}"
+          + (f" ({counts})" if counts else ""))
+
+
+#### PROFILE ####
+# Runs the enclosed code under cProfile and writes the stats to path (read with pstats)
+@contextlib.contextmanager
+def profile(path):
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -1,28 +1,30 @@
 import cv2 as cv
 import numpy as np
 
+from .instrument import progress
+
 
 #### NORMALIZE ####
 # This function normalizes the colors in an image based on
 # a detected white object. Returns a normalized image.
-# img - image to normalize
+# img - image to normalize (uint8 BGR)
 # max_gain_factor - limits channel amplification to prevent overexposure
 # percentile_ref - reference white color is selected based on this percentile
+# white - (center, radius) of the white ball if already known (skips the white object search)
+# inplace - write the result into img instead of a new image
 
-def normalize(img, max_gain_factor=2.0, percentile_ref=95):
-    print("\033[1m-----[Normalize Photo]-----\033[0m")
+def normalize(img, max_gain_factor=2.0, percentile_ref=95, white=None, inplace=False):
+    progress("\033[1m-----[Normalize Photo]-----\033[0m")
 
     if img is None:
         raise Exception(f"\033[31m[NP 1/3!!!]\033[0m Invalid image")
 
-    print(f"\033[32m[NP 1/3]\033[0m Image loaded successfully")
+    progress(f"\033[32m[NP 1/3]\033[0m Image loaded successfully")
 
-    center, radius = find_white(img)
+    center, radius = find_white(img) if white is None else white
 
     if center and radius and radius > 0:
-        # Properly loaded image
-        img_data = cv.cvtColor(img, cv.COLOR_BGR2RGB)
-        height, width = img_data.shape[:2]
+        height, width = img.shape[:2]
 
         # Coordinates of rectangular ROI around the white ball
         x1 = max(0, center[0] - radius)
@@ -33,8 +35,8 @@ def normalize(img, max_gain_factor=2.0, percentile_ref=95):
         if x1 >= x2 or y1 >= y2:
             raise Exception(f"\033[31m[NP 3/3!!!]\033[0m Normalization failed")
 
-        # Crop the ROI from image
-        roi = img_data[y1:y2, x1:x2]
+        # Crop the ROI from image (a view, BGR)
+        roi = img[y1:y2, x1:x2]
         roi_h, roi_w, _ = roi.shape
 
         # Center coordinates relative to ROI
@@ -44,16 +46,14 @@ def normalize(img, max_gain_factor=2.0, percentile_ref=95):
         # Select pixels inside the circular area of the ball
         Y, X = np.ogrid[:roi_h, :roi_w]
         dist_from_center = np.sqrt((X - roi_center_x) ** 2 + (Y - roi_center_y) ** 2)
-        mask_circle = dist_from_center <= radius
-        white_pixels = roi[mask_circle]
+        mask_circle = (dist_from_center <= radius).astype(np.uint8)
 
-        if white_pixels.size == 0:
+        if not mask_circle.any():
             raise Exception(f"\033[31m[NP 3/3!!!]\033[0m Normalization failed")
 
-        # Reference RGB color from the selected percentile of ball pixels
-        ref_r = np.percentile(white_pixels[:, 0], percentile_ref)
-        ref_g = np.percentile(white_pixels[:, 1], percentile_ref)
-        ref_b = np.percentile(white_pixels[:, 2], percentile_ref)
+        # Reference BGR color from the selected percentile of ball pixels
+        ref_b, ref_g, ref_r = (histogram_percentile(roi, channel, mask_circle, percentile_ref)
+                               for channel in range(3))
 
         # Minimum reference threshold
         min_ref_threshold = 10
@@ -73,23 +73,33 @@ def normalize(img, max_gain_factor=2.0, percentile_ref=95):
         g_factor = min(g_factor_raw, max_gain_factor)
         b_factor = min(b_factor_raw, max_gain_factor)
 
-        # Apply gain factors to each channel
-        normalized_data = img_data.astype(np.float32)
-        normalized_data[:, :, 0] *= r_factor
-        normalized_data[:, :, 1] *= g_factor
-        normalized_data[:, :, 2] *= b_factor
-
-        # Clip values to valid color range
-        np.clip(normalized_data, 0, 255, out=normalized_data)
-        normalized_data = normalized_data.astype(np.uint8)
+        # Gains applied through a lookup table (one 256-entry table per channel), so the image
+        # stays uint8 BGR and no float copy of it is made
+        lut = np.empty((1, 256, 3), dtype=np.uint8)
+        for channel, factor in enumerate((b_factor, g_factor, r_factor)):
+            values = np.arange(256, dtype=np.float32)
+            values *= factor
+            np.clip(values, 0, 255, out=values)
+            lut[0, :, channel] = values.astype(np.uint8)
 
-        # Convert back from RGB to BGR (OpenCV default)
-        normalized_bgr = cv.cvtColor(normalized_data, cv.COLOR_RGB2BGR)
+        normalized_bgr = cv.LUT(img, lut, dst=img if inplace else None)
 
-        print(f"\033[32m[NP 3/3]\033[0m Image colors normalized")
+        progress(f"\033[32m[NP 3/3]\033[0m Image colors normalized")
         return normalized_bgr
 
 
+# Percentile (linear interpolation, as np.percentile) of one channel of the masked pixels,
+# computed from the channel histogram
+def histogram_percentile(img, channel, mask, percentile):
+    histogram = cv.calcHist([img], [channel], mask, [256], [0, 256])[:, 0]
+    counts = np.cumsum(histogram.astype(np.int64))
+    rank = (counts[-1] - 1) * percentile / 100
+    low = int(rank)
+    value_low, value_high = np.searchsorted(counts, [low, low + 1], side="right")
+    value_high = min(value_high, 255)
+    return value_low + (rank - low) * (value_high - value_low)
+
+
 #### FIND WHITE ####
 # This function detects a white object to be used as reference for normalization
 # img - input image
@@ -138,5 +148,5 @@ def find_white(img):
     if center is None:
         raise Exception(f"\033[31m[NP 2/3!!!]\033[0m White object not detected")
 
-    print(f"\033[32m[NP 2/3]\033[0m White object detected")
+    progress(f"\033[32m[NP 2/3]\033[0m White object detected")
     return center, radius
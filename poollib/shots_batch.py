@@ -0,0 +1,473 @@
+import itertools
+from functools import lru_cache
+
+import numpy as np
+
+from .Ball import Ball
+from .ShotSet import ShotSet
+from .shot_init import BALL_DIAMETER
+from .shots_calculations import HOLE_DIAMETER, HOLE_DIAMETER2
+
+# Pockets in the same order as get_shots: UL, UR, CL, CR, LL, LR
+HOLES = np.array([
+    [0 + HOLE_DIAMETER, 0 + HOLE_DIAMETER],
+    [1000 - HOLE_DIAMETER, 0 + HOLE_DIAMETER],
+    [0 + HOLE_DIAMETER, 1000],
+    [1000 - HOLE_DIAMETER, 1000],
+    [0 + HOLE_DIAMETER, 2000 - HOLE_DIAMETER],
+    [1000 - HOLE_DIAMETER, 2000 - HOLE_DIAMETER],
+], dtype=np.int64)
+
+# Cushions in order: top, right, bottom, left
+# Each cushion is a line: axis 1 (horizontal, y = value) or axis 0 (vertical, x = value)
+EDGE_AXIS = np.array([1, 0, 1, 0])
+EDGE_VALUE = np.array([HOLES[0, 1], HOLES[1, 0], HOLES[4, 1], HOLES[0, 0]], dtype=np.int64)
+
+# Two cushions used for target ball reflections, per pocket (indexes into EDGE_*)
+HOLE_EDGES = np.array([
+    [2, 1],  # UL: bottom, right
+    [3, 2],  # UR: left, bottom
+    [2, 0],  # CL: bottom, top
+    [2, 0],  # CR: bottom, top
+    [0, 1],  # LL: top, right
+    [3, 0],  # LR: left, top
+])
+
+# Order of shots generated for each pocket, as (target variant, white variant)
+# Target variant: 0 direct, 1-2 reflection off HOLE_EDGES; white variant: 0 direct, 1-4 off EDGE_*
+SHOT_ORDER = np.array([(0, 0), (1, 0), (2, 0)] + [(t, w) for t in range(3) for w in range(1, 5)])
+
+
+# Create all possible shots for all target balls at once
+# white   - white Ball or its (x, y) centre
+# targets - list of target Balls or their (K, 2) centres
+# returns a dict of NumPy arrays, one row per shot, in the same order get_shots produces them
+def get_shots_batch(white, targets):
+    if isinstance(white, Ball):
+        white = white.get_coordinates()
+    if len(targets) and isinstance(targets[0], Ball):
+        targets = [t.get_coordinates() for t in targets]
+    white_xy = np.array(white, dtype=np.int64)
+    target_xy = np.array(targets, dtype=np.int64).reshape(-1, 2)
+    k = len(target_xy)
+
+    # Target paths: (targets, holes, 3 variants)
+    t_start = np.broadcast_to(target_xy[:, None, None, :], (k, 6, 3, 2))
+    hole = np.broadcast_to(HOLES[None, :, None, :], (k, 6, 3, 2))
+    edges = np.concatenate([HOLE_EDGES[:, :1], HOLE_EDGES], axis=1)
+    t_edge, t_bank = find_edge_points(t_start, hole, edges, banked=np.array([False, True, True]))
+
+    t_end = np.where(t_bank[..., None], t_edge, hole)
+    t_len = np.where(t_bank, _dist(t_start, t_edge) + _dist(t_edge, hole), _dist(t_start, hole))
+    ghost = get_ghosts(t_start, t_end)
+    ghost_px = _to_px(ghost)
+
+    # White paths: (targets, holes, 3 target variants, 5 white variants)
+    w_start = np.broadcast_to(white_xy, (k, 6, 3, 5, 2))
+    w_ghost = np.broadcast_to(ghost_px[:, :, :, None, :], (k, 6, 3, 5, 2))
+    w_edges = np.broadcast_to(np.arange(-1, 4), (k, 6, 3, 5))
+    w_edge, w_bank = find_edge_points(w_start, w_ghost, np.maximum(w_edges, 0), banked=w_edges >= 0)
+
+    # Select shots in get_shots order
+    tv, wv = SHOT_ORDER[:, 0], SHOT_ORDER[:, 1]
+    n = k * 6 * len(SHOT_ORDER)
+    t_start = t_start[:, :, tv].reshape(n, 2)
+    hole = hole[:, :, tv].reshape(n, 2)
+    t_edge = t_edge[:, :, tv].reshape(n, 2)
+    t_bank = t_bank[:, :, tv].reshape(n)
+    t_end = t_end[:, :, tv].reshape(n, 2)
+    t_len = t_len[:, :, tv].reshape(n)
+    ghost = ghost[:, :, tv].reshape(n, 2)
+    ghost_px = ghost_px[:, :, tv].reshape(n, 2)
+    w_start = w_start[:, :, tv, wv].reshape(n, 2)
+    w_edge = w_edge[:, :, tv, wv].reshape(n, 2)
+    w_bank = w_bank[:, :, tv, wv].reshape(n)
+
+    w_len = np.where(w_bank, _dist(w_start, w_edge) + _dist(w_edge, ghost_px), _dist(w_start, ghost_px))
+    angle = get_cut_angles(np.where(w_bank[:, None], w_edge, w_start), ghost_px, t_start, t_end)
+
+    return {
+        "target_idx": np.repeat(np.arange(k), 6 * len(SHOT_ORDER)),
+        "hole_idx": np.tile(np.repeat(np.arange(6), len(SHOT_ORDER)), k),
+        "white": w_start,
+        "target": t_start,
+        "hole": hole,
+        "target_edge": t_edge,
+        "target_bank": t_bank,
+        "white_edge": w_edge,
+        "white_bank": w_bank,
+        "ghost": ghost,
+        "angle": angle,
+        "length": t_len + w_len,
+    }
+
+
+# Vectorized find_edge_point: reflection point on a cushion for a path from start to end
+# start, end - integer arrays (..., 2)
+# edge       - indexes into EDGE_AXIS/EDGE_VALUE, broadcastable to start[..., 0]
+# banked     - which paths actually reflect
+# returns (points truncated to pixels, mask of paths that have a reflection point)
+def find_edge_points(start, end, edge, banked):
+    shape = np.broadcast_shapes(start.shape[:-1], np.shape(edge))
+    x1, y1 = start[..., 0], start[..., 1]
+    x2, y2 = end[..., 0], end[..., 1]
+    horizontal = np.broadcast_to(EDGE_AXIS[edge] == 1, shape)
+    value = np.broadcast_to(EDGE_VALUE[edge], shape)
+
+    # Mirror the end point across the cushion
+    mx = np.where(horizontal, x2, 2 * value - x2)
+    my = np.where(horizontal, 2 * value - y2, y2)
+    dx = mx - x1
+    dy = my - y1
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m = dy / dx
+        b = y1 - m * x1
+        x_int = np.where(horizontal, (value - b) / m, value)
+        y_int = np.where(horizontal, value, m * value + b)
+
+    # Degenerate cases handled like find_edge_point
+    x_int = np.where(dx == 0, x1, np.where(dy == 0, value, x_int))
+    y_int = np.where(dx == 0, value, np.where(dy == 0, y1, y_int))
+    valid = banked & np.where(dx == 0, horizontal, np.where(dy == 0, ~horizontal, True))
+
+    points = np.stack([x_int, y_int], axis=-1)
+    points = np.trunc(np.where(valid[..., None], points, 0)).astype(np.int64)
+    return points, valid
+
+
+# Create shots with up to `cushions` target ball banks and `kicks` white ball banks (mirror method)
+# The path off a cushion sequence is the straight line to the pocket (or ghost) mirrored across
+# those cushions; mirrored pockets come from precomputed tables (see mirrored_holes).
+# Paths that do not reach every cushion of their sequence, or bounce inside a pocket zone, are
+# pruned before target paths are paired with white paths.
+# returns a batch like get_shots_batch (target_edge is the first target bank point, white_edge the
+# last white one) with all bank points in "target_rails"/"white_rails" (N, cushions/kicks, 2)
+# and their numbers in "target_banks"/"white_banks"
+def get_rail_shots_batch(white, targets, cushions=2, kicks=None):
+    kicks = cushions if kicks is None else kicks
+    if isinstance(white, Ball):
+        white = white.get_coordinates()
+    if len(targets) and isinstance(targets[0], Ball):
+        targets = [t.get_coordinates() for t in targets]
+    white_xy = np.array(white, dtype=np.int64)
+    target_xy = np.array(targets, dtype=np.int64).reshape(-1, 2)
+    k = len(target_xy)
+
+    # Target paths: (targets, holes, direct + cushion sequences)
+    t_rails, t_counts, _, _ = rail_variants(cushions)
+    images = np.concatenate([HOLES[None], mirrored_holes(cushions)])
+    v = len(t_counts)
+    t_start = np.broadcast_to(target_xy[:, None, None, :], (k, 6, v, 2))
+    t_points, t_valid = unfold_paths(t_start, np.broadcast_to(images.transpose(1, 0, 2), (k, 6, v, 2)),
+                                     np.broadcast_to(t_rails, (k, 6, v, cushions)))
+    target_idx, hole_idx, t_variant = np.nonzero(t_valid)
+    t_start = target_xy[target_idx]
+    hole = HOLES[hole_idx]
+    t_points = t_points[t_valid]
+    t_banks = t_counts[t_variant]
+    t_len = path_lengths(t_start, t_points, t_banks, hole)
+    ghost = get_ghosts(t_start, np.where(t_banks[:, None] > 0, t_points[:, 0], hole))
+    ghost_px = _to_px(ghost)
+
+    # White paths: (target paths, direct + cushion sequences), the ghost mirrored per sequence
+    w_rails, w_counts, sign, offset = rail_variants(kicks)
+    p, w = len(t_start), len(w_counts)
+    w_start = np.broadcast_to(white_xy, (p, w, 2))
+    w_points, w_valid = unfold_paths(w_start, sign * ghost_px[:, None, :] + offset,
+                                     np.broadcast_to(w_rails, (p, w, kicks)))
+    path_idx, w_variant = np.nonzero(w_valid)
+    w_points = w_points[w_valid]
+    w_banks = w_counts[w_variant]
+    w_start = w_start[path_idx, w_variant]
+    ghost_px = ghost_px[path_idx]
+    w_len = path_lengths(w_start, w_points, w_banks, ghost_px)
+
+    t_points, t_banks, t_start, hole = t_points[path_idx], t_banks[path_idx], t_start[path_idx], hole[path_idx]
+    rows = np.arange(len(path_idx))
+    t_edge = np.where(t_banks[:, None] > 0, t_points[:, 0], 0)
+    w_edge = np.where(w_banks[:, None] > 0, w_points[rows, np.maximum(w_banks - 1, 0)], 0)
+    angle = get_cut_angles(np.where(w_banks[:, None] > 0, w_edge, w_start), ghost_px, t_start,
+                           np.where(t_banks[:, None] > 0, t_edge, hole))
+
+    return {
+        "target_idx": target_idx[path_idx],
+        "hole_idx": hole_idx[path_idx],
+        "white": w_start,
+        "target": t_start,
+        "hole": hole,
+        "target_edge": t_edge,
+        "target_bank": t_banks > 0,
+        "white_edge": w_edge,
+        "white_bank": w_banks > 0,
+        "ghost": ghost[path_idx],
+        "angle": angle,
+        "length": t_len[path_idx] + w_len,
+        "target_rails": t_points,
+        "target_banks": t_banks,
+        "white_rails": w_points,
+        "white_banks": w_banks,
+    }
+
+
+# Cushion sequences of 1 to n cushions, without the same cushion twice in a row, as mirror transforms:
+# a point mirrored across the cushions of a sequence (last cushion first) is sign * point + offset
+# returns (cushions (S, n) padded with -1, number of cushions (S,), sign (S, 2), offset (S, 2))
+@lru_cache(maxsize=None)
+def cushion_sequences(n):
+    sequences = [sequence for length in range(1, n + 1) for sequence in itertools.product(range(4), repeat=length)
+                 if all(a != b for a, b in zip(sequence, sequence[1:]))]
+    cushions = np.full((len(sequences), n), -1, dtype=np.int64)
+    sign = np.ones((len(sequences), 2), dtype=np.int64)
+    offset = np.zeros((len(sequences), 2), dtype=np.int64)
+    for i, sequence in enumerate(sequences):
+        cushions[i, :len(sequence)] = sequence
+        for edge in reversed(sequence):
+            axis = EDGE_AXIS[edge]
+            sign[i, axis] = -sign[i, axis]
+            offset[i, axis] = 2 * EDGE_VALUE[edge] - offset[i, axis]
+    counts = (cushions >= 0).sum(axis=1)
+    return _frozen(cushions, counts, sign, offset)
+
+
+# Pockets mirrored across every cushion sequence of up to n cushions (S, 6, 2), computed once
+@lru_cache(maxsize=None)
+def mirrored_holes(n):
+    _, _, sign, offset = cushion_sequences(n)
+    return _frozen(sign[:, None, :] * HOLES[None] + offset[:, None, :])[0]
+
+
+# Direct path followed by the cushion sequences of up to n cushions (the direct path mirrors nothing)
+# returns (cushions (1 + S, n), counts (1 + S,), sign (1 + S, 2), offset (1 + S, 2))
+@lru_cache(maxsize=None)
+def rail_variants(n):
+    cushions, counts, sign, offset = cushion_sequences(n)
+    return _frozen(np.concatenate([np.full((1, n), -1, dtype=np.int64), cushions]),
+                   np.concatenate([[0], counts]),
+                   np.concatenate([[[1, 1]], sign]),
+                   np.concatenate([[[0, 0]], offset]))
+
+
+def _frozen(*arrays):
+    # Cached tables are shared, so they are made read-only
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays
+
+
+# Bank points of paths from start towards the mirror image of their end point, cushion by cushion:
+# the line to the image crosses the first cushion at the first bank point, then the image is
+# mirrored back across that cushion and the next cushion is crossed from there
+# start, image - (..., 2) points, cushions - (..., n) sequence of every path padded with -1
+# returns (bank points truncated to pixels (..., n, 2), 0 where unused; mask of possible paths:
+#          every cushion reached in order, between its corner pockets and outside the pocket zones)
+def unfold_paths(start, image, cushions):
+    point = start.astype(np.float64)
+    image = image.astype(np.float64)
+    valid = np.ones(cushions.shape[:-1], dtype=bool)
+    points = np.zeros(cushions.shape + (2,), dtype=np.float64)
+
+    for j in range(cushions.shape[-1]):
+        used = cushions[..., j] >= 0
+        edge = np.maximum(cushions[..., j], 0)
+        axis = EDGE_AXIS[edge]
+        value = EDGE_VALUE[edge]
+        along = np.take_along_axis(point, axis[..., None], axis=-1)[..., 0]
+        towards = np.take_along_axis(image, axis[..., None], axis=-1)[..., 0]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = (value - along) / (towards - along)
+            hit = point + t[..., None] * (image - point)
+        # The bank point lies exactly on the cushion line (rounding would put it a pixel outside)
+        hit = np.where(np.arange(2) == axis[..., None], value[..., None], hit)
+
+        # The other coordinate must lie between the corner pockets of the cushion
+        across = np.take_along_axis(hit, 1 - axis[..., None], axis=-1)[..., 0]
+        low = np.where(axis == 1, EDGE_VALUE[3], EDGE_VALUE[0])
+        high = np.where(axis == 1, EDGE_VALUE[1], EDGE_VALUE[2])
+        reached = (t > 0) & (t < 1) & (across >= low) & (across <= high)
+        valid &= ~used | reached
+
+        points[..., j, :] = np.where(used[..., None], hit, 0)
+        point = np.where(used[..., None], hit, point)
+        mirrored = np.where(np.arange(2) == axis[..., None], 2 * value[..., None] - image, image)
+        image = np.where(used[..., None], mirrored, image)
+
+    points = np.trunc(np.where(np.isfinite(points), points, 0)).astype(np.int64)
+    in_pocket = ~edge_possible_mask(points) & (cushions >= 0)
+    return points, valid & ~in_pocket.any(axis=-1)
+
+
+# Length of paths from start over their first `banks` bank points to end
+def path_lengths(start, points, banks, end):
+    used = np.arange(points.shape[1]) < banks[:, None]
+    path = np.concatenate([start[:, None], np.where(used[..., None], points, end[:, None]), end[:, None]], axis=1)
+    return _dist(path[:, :-1], path[:, 1:]).sum(axis=1)
+
+
+# Vectorized get_ghost: ghost ball positions for target paths (..., 2)
+def get_ghosts(target, end):
+    d = end - target
+    distance = np.sqrt(d[..., 0] ** 2 + d[..., 1] ** 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unit = d / distance[..., None]
+    return target - unit * BALL_DIAMETER
+
+
+# Vectorized get_cut_angle: angle between white path into the ghost and target path out of it
+def get_cut_angles(white, ghost, target, end):
+    v1 = white - ghost
+    v2 = end - target
+    mag1 = np.sqrt(v1[:, 0] ** 2 + v1[:, 1] ** 2)
+    mag2 = np.sqrt(v2[:, 0] ** 2 + v2[:, 1] ** 2)
+    dot = v1[:, 0] * v2[:, 0] + v1[:, 1] * v2[:, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cos_angle = np.clip(dot / (mag1 * mag2), -1, 1)
+    # Same operation order as math.degrees to keep results identical to get_cut_angle
+    angle = np.arccos(cos_angle) / (np.pi / 180)
+    return np.round(angle, 1)
+
+
+def _to_px(points):
+    # Truncate to pixels like int(); a ball lying on a pocket centre gives NaN and an invalid shot
+    with np.errstate(invalid="ignore"):
+        return np.trunc(points).astype(np.int64)
+
+
+def _dist(p, q):
+    d = q - p
+    return np.sqrt(d[..., 0] ** 2 + d[..., 1] ** 2)
+
+
+# Path segments of every shot, in the order validate_shots checks them:
+# target path, white path, target rebound, white rebound
+# (multi-cushion batches: all target segments, then all white segments, see rail_segments)
+# returns (segments (N, 4, 2, 2), mask of segments that exist (N, 4))
+def shot_segments(batch):
+    if "target_rails" in batch:
+        return rail_segments(batch)
+    ghost_px = _to_px(batch["ghost"])
+    t_bank = batch["target_bank"][:, None]
+    w_bank = batch["white_bank"][:, None]
+    t_end = np.where(t_bank, batch["target_edge"], batch["hole"])
+    w_end = np.where(w_bank, batch["white_edge"], ghost_px)
+
+    segments = np.stack([
+        np.stack([batch["target"], t_end], axis=1),
+        np.stack([batch["white"], w_end], axis=1),
+        np.stack([batch["target_edge"], batch["hole"]], axis=1),
+        np.stack([batch["white_edge"], ghost_px], axis=1),
+    ], axis=1)
+    exists = np.stack([np.ones_like(batch["target_bank"]), np.ones_like(batch["white_bank"]),
+                       batch["target_bank"], batch["white_bank"]], axis=1)
+    return segments, exists
+
+
+# Path segments of a batch from get_rail_shots_batch
+# returns (segments (N, cushions + kicks + 2, 2, 2), mask of segments that exist)
+def rail_segments(batch):
+    ghost_px = _to_px(batch["ghost"])
+    segments, exists = [], []
+    for start, rails, banks, end in ((batch["target"], batch["target_rails"], batch["target_banks"], batch["hole"]),
+                                     (batch["white"], batch["white_rails"], batch["white_banks"], ghost_px)):
+        used = np.arange(rails.shape[1]) < banks[:, None]
+        path = np.concatenate([start[:, None], np.where(used[..., None], rails, end[:, None]), end[:, None]], axis=1)
+        segments.append(np.stack([path[:, :-1], path[:, 1:]], axis=2))
+        exists.append(np.arange(rails.shape[1] + 1) <= banks[:, None])
+    return np.concatenate(segments, axis=1), np.concatenate(exists, axis=1)
+
+
+# Vectorized ball_shot_dist: distance from every ball to every segment
+# segments - (..., 2, 2) segment endpoints
+# balls    - (B, 2) ball centres
+# returns distances (..., B)
+def segment_ball_distances(segments, balls):
+    p1 = segments[..., None, 0, :]
+    d = segments[..., None, 1, :] - p1
+    length2 = d[..., 0] * d[..., 0] + d[..., 1] * d[..., 1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = ((balls[:, 0] - p1[..., 0]) * d[..., 0] + (balls[:, 1] - p1[..., 1]) * d[..., 1]) / length2
+    t = np.where(length2 == 0, 0, np.clip(t, 0, 1))
+
+    nearest_x = p1[..., 0] + t * d[..., 0]
+    nearest_y = p1[..., 1] + t * d[..., 1]
+    return np.hypot(balls[:, 0] - nearest_x, balls[:, 1] - nearest_y)
+
+
+# Vectorized is_shot_blocked for segments from shot_segments (e.g. a subset of shots against a subset of balls)
+# exists      - mask of segments that exist (N, S)
+# balls       - (B, 2) ball centres
+# ball_radius - radius used for collisions
+# returns (blocked mask (N,), index of the first blocking ball or -1 (N,))
+def find_blocked_segments(segments, exists, balls, ball_radius):
+    balls = np.asarray(balls, dtype=np.int64).reshape(-1, 2)
+    dist = segment_ball_distances(segments, balls)
+
+    # A ball never blocks a segment that starts or ends on it
+    bx, by = balls[:, 0], balls[:, 1]
+    on_end = (((segments[..., None, 0, 0] == bx) & (segments[..., None, 0, 1] == by)) |
+              ((segments[..., None, 1, 0] == bx) & (segments[..., None, 1, 1] == by)))
+    hits = (dist < 2 * ball_radius - 2) & ~on_end & exists[..., None]
+
+    ball_hit = hits.any(axis=1)
+    blocked = ball_hit.any(axis=1)
+    blocker = np.where(blocked, ball_hit.argmax(axis=1), -1)
+    return blocked, blocker
+
+
+# Vectorized is_edge_possible: True where a segment starting at point is clear of the pocket zones
+def edge_possible_mask(points):
+    x, y = points[..., 0], points[..., 1]
+    left = x < HOLE_DIAMETER2
+    right = x > 1000 - HOLE_DIAMETER2
+    top = y < HOLE_DIAMETER2
+    middle = (1000 - HOLE_DIAMETER2 < y) & (y < 1000 + HOLE_DIAMETER2)
+    bottom = y > 2000 - HOLE_DIAMETER2
+    return ~((left | right) & (top | middle | bottom))
+
+
+# Check all shots at once: not blocked, playable cut angle, no rebound inside a pocket
+# index - optional TableIndex; when given, only balls in the grid cells a segment crosses are checked
+# Blocking is only checked for shots with a playable angle and no rebound inside a pocket (neither
+# depends on the other balls). The other shots are invalid whatever balls lie on their paths and get
+# blocker -1, so moving or pocketing a ball never makes them valid (see Table.move_ball)
+# returns (valid mask (N,), index of the first blocking ball or -1 (N,))
+def validate_batch(batch, balls, ball_radius, min_angle=120, index=None):
+    segments, exists = shot_segments(batch)
+    edges_ok = edge_possible_mask(segments[:, :, 0]) if index is None else index.edge_possible(segments[:, :, 0])
+    playable = (batch["angle"] > min_angle) & (edges_ok | ~exists).all(axis=1)
+    segments, exists = segments[playable], exists[playable]
+
+    if index is None:
+        blocked, blocker = find_blocked_segments(segments, exists, balls, ball_radius)
+    else:
+        seg_blocked = np.zeros(exists.shape, dtype=bool)
+        seg_blocker = np.full(exists.shape, -1, dtype=np.int64)
+        seg_blocked[exists], seg_blocker[exists] = index.blocked_segments(segments[exists])
+        blocked = seg_blocked.any(axis=1)
+        blocker = np.where(seg_blocker >= 0, seg_blocker, np.iinfo(np.int64).max).min(axis=1)
+        blocker = np.where(blocked, blocker, -1)
+
+    valid = playable.copy()
+    valid[playable] = ~blocked
+    all_blockers = np.full(len(playable), -1, dtype=np.int64)
+    all_blockers[playable] = blocker
+    return valid, all_blockers
+
+
+# Select shots from a batch by index or boolean mask
+def take_shots(batch, index):
+    return {key: value[index] for key, value in batch.items()}
+
+
+# Join batches calculated separately (e.g. for different ball types)
+def concat_batches(first, second):
+    if first is None:
+        return second
+    return {key: np.concatenate([first[key], second[key]]) for key in first}
+
+
+# Shot objects (views of the batch rows) without recomputing any geometry
+def batch_to_shots(batch):
+    return list(ShotSet(batch))
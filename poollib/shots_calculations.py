@@ -1,10 +1,15 @@
 import math
+import numpy as np
 from .Shot import Shot
 
 HOLE_DIAMETER = 40
 HOLE_DIAMETER2 = HOLE_DIAMETER + 10
 RECOMMENDATIONS = 3
 
+# Shot score (lower is better): ((180 - angle) * weights["angle"] + length * weights["length"]) * edge[banks]
+# (every bank beyond the last factor multiplies it again by the ratio of the last two factors)
+SCORE_WEIGHTS = {"angle": 300, "length": 1, "edge": (1.0, 4.0, 8.0)}
+
 # Create all possible shots for a given target ball
 def get_shots(white, target):
     holes = [
@@ -163,31 +168,72 @@ def is_edge_possible(line):
     else:
         return True
 
-def get_best_shots(shots):
-    factors = []
-    best_shots = []
-
-    if len(shots) <= RECOMMENDATIONS:
-        return shots
-
-    for shot in shots:
-        print(".", end='')
-
-        t1, w1 = shot.get_lines()
-        if len(t1) > 1 and len(w1) > 1:
-            edge_shot = 8.0
-        elif len(t1) > 1 or len(w1) > 1:
-            edge_shot = 4.0
-        else:
-            edge_shot = 1.0
-
-        factor = ((180 - shot.get_angle()) * 300 + shot.get_length()) * edge_shot
-        factors.append(factor)
-
-    for i in range(RECOMMENDATIONS):
-        index = factors.index(min(factors))
-        best_shots.append(shots[index])
-        del shots[index]
-        del factors[index]
-
-    return best_shots
+# Select the best shots (does not modify the given list)
+# k       - number of recommendations (None = all, ranked)
+# weights - score weights, see SCORE_WEIGHTS
+# pareto  - only consider shots on the Pareto front of angle, length and number of banks
+def get_best_shots(shots, k=RECOMMENDATIONS, weights=None, pareto=False):
+    angles = np.array([shot.get_angle() for shot in shots], dtype=np.float64)
+    lengths = np.array([shot.get_length() for shot in shots], dtype=np.float64)
+    banks = np.array([(len(t1) > 1) + (len(w1) > 1) for t1, w1 in (shot.get_lines() for shot in shots)],
+                     dtype=np.int64)
+    return [shots[i] for i in rank_shots(angles, lengths, banks, k, weights, pareto).tolist()]
+
+
+# Vectorized ranking of shots given as arrays (one element per shot)
+# banks - number of banked paths of each shot (0, 1 or 2)
+# returns indices of the best shots, best first; with k or fewer shots and no Pareto filter
+# all indices are returned in their original order
+def rank_shots(angles, lengths, banks, k=RECOMMENDATIONS, weights=None, pareto=False):
+    n = len(angles)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    factors = shot_scores(angles, lengths, banks, weights)
+
+    if pareto:
+        candidates = pareto_front(angles, lengths, banks)
+    elif k is None or n > k:
+        candidates = np.arange(n)
+    else:
+        return np.arange(n)
+
+    # Only the k smallest scores need sorting; ties keep the original order
+    if k is not None and len(candidates) > k:
+        kth = np.partition(factors[candidates], k - 1)[k - 1]
+        candidates = candidates[factors[candidates] <= kth]
+    order = candidates[np.argsort(factors[candidates], kind="stable")]
+    return order if k is None else order[:k]
+
+
+# Score of every shot (lower is better), see SCORE_WEIGHTS
+def shot_scores(angles, lengths, banks, weights=None):
+    weights = SCORE_WEIGHTS if weights is None else {**SCORE_WEIGHTS, **weights}
+    edge = np.asarray(weights["edge"], dtype=np.float64)
+    if len(banks) and banks.max() >= len(edge):
+        ratio = edge[-1] / edge[-2] if len(edge) > 1 else 1.0
+        edge = np.concatenate([edge, edge[-1] * ratio ** np.arange(1, banks.max() - len(edge) + 2)])
+    return ((180 - angles) * weights["angle"] + lengths * weights["length"]) * edge[banks]
+
+
+# Shots not dominated by another shot with a wider (easier) angle, shorter length and fewer banks
+# returns indices of the front in original order
+def pareto_front(angles, lengths, banks):
+    # Sorted by angle (widest first), length, banks: a shot can only be dominated by shots before it
+    order = np.lexsort((banks, lengths, -angles))
+    a, l, b = angles[order], lengths[order], banks[order]
+
+    # Identical shots do not dominate each other: compare against shots before the first copy
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = (a[1:] != a[:-1]) | (l[1:] != l[:-1]) | (b[1:] != b[:-1])
+    group_start = np.maximum.accumulate(np.where(new_group, np.arange(len(order)), 0))
+
+    dominated = np.zeros(len(order), dtype=bool)
+    for level in np.unique(b).tolist():
+        # Shortest length so far among shots with at most this many banks (before each position)
+        reach = np.where(b <= level, l, np.inf)
+        shortest = np.concatenate([[np.inf], np.minimum.accumulate(reach)[:-1]])
+        at_level = b == level
+        dominated[at_level] = shortest[group_start[at_level]] <= l[at_level]
+
+    return np.sort(order[~dominated])
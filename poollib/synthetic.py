@@ -0,0 +1,141 @@
+import cv2 as cv
+import numpy as np
+
+from .visualize import create_table
+from .BallSet import BallSet, type_code
+
+# Table size of the transformed photos (width, height)
+TABLE_SIZE = (1000, 2000)
+
+# Ball radius in pixels, as in detection and categorization
+BALL_RADIUS = 23
+
+# Distance of ball centres from the table edge (cushion + ball) and minimal gap between balls
+EDGE_MARGIN = 25 + BALL_RADIUS + 10
+BALL_GAP = 8
+
+# Colors (BGR) of the numbered balls 1-7, the stripes 9-15 use the same ones
+BALL_COLORS = [
+    (0, 215, 255),      # yellow
+    (180, 40, 40),      # blue (well outside the cloth hue range, see CLOTH_COLOR)
+    (30, 30, 220),      # red
+    (130, 0, 100),      # purple
+    (0, 120, 255),      # orange
+    (40, 140, 30),      # green
+    (20, 20, 120),      # maroon
+]
+BLACK_COLOR = (20, 20, 20)
+
+# White of the cue ball and the stripes: slightly warm where lit, fading to a neutral grey from
+# WHITE_FADE of the radius to the rim, so its brightest cluster is also its most saturated one
+# and the classifier reads the cue ball as white (a flat grey splits on noise hue, see calculate_color)
+WHITE_COLOR = (225, 240, 250)
+WHITE_SHADE = (200, 200, 200)
+WHITE_FADE = 0.5
+
+# Half width of the band of a stripe, as a fraction of the radius; wider bands cover so much of
+# the ball that the classifier takes stripes for solids
+STRIPE_HALF_WIDTH = 0.2
+
+# Cloth and cushions: the cushions are covered with the same cloth (same hue, darker),
+# as in the photos, since detection samples the cloth color at the top and bottom edges
+CLOTH_COLOR = (200, 150, 69)
+CUSHION_COLOR = (160, 120, 55)
+
+
+#### SYNTHETIC TABLE ####
+# Renders a top-down table like the transformed photos, with balls at random positions
+# n_balls  - number of balls (white first, then black, then solids and stripes alternately, up to 16)
+# seed     - random seed, the same seed gives the same table
+# noise    - standard deviation of the Gaussian pixel noise
+# lighting - strength of the uneven lighting (0 = flat, 0.3 = 30% darker in the dimmest corner)
+# returns (BGR image, BallSet with the true centres, types and colors)
+def synthetic_table(n_balls=16, seed=0, noise=6.0, lighting=0.2):
+    if not 1 <= n_balls <= 16:
+        raise Exception("[SYNTHETIC] Ball count must be between 1 and 16")
+
+    rng = np.random.default_rng(seed)
+    width, height = TABLE_SIZE
+    img = create_table(np.zeros((height, width, 3), dtype=np.uint8), CLOTH_COLOR, CUSHION_COLOR)
+
+    types, colors = ball_types(n_balls)
+    centers = random_centers(n_balls, rng)
+    for (x, y), ball_type, color in zip(centers.tolist(), types, colors):
+        draw_ball(img, (x, y), ball_type, color, rng.uniform(0, np.pi))
+
+    img = apply_lighting(img, lighting, rng)
+    if noise > 0:
+        img = np.clip(img + rng.normal(0, noise, img.shape), 0, 255).astype(np.uint8)
+
+    return img, BallSet(centers, [type_code(ball_type) for ball_type in types], colors)
+
+
+# Types and colors of n balls: white, black, then solids and stripes alternately
+def ball_types(n_balls):
+    types, colors = ["white", "black"], [WHITE_COLOR, BLACK_COLOR]
+    for i in range(14):
+        types.append("solid" if i % 2 == 0 else "stripe")
+        colors.append(BALL_COLORS[i // 2])
+    return types[:n_balls], colors[:n_balls]
+
+
+# Random ball centres (B, 2) on the cloth, not touching each other
+def random_centers(n_balls, rng):
+    width, height = TABLE_SIZE
+    centers = []
+    while len(centers) < n_balls:
+        x = int(rng.integers(EDGE_MARGIN, width - EDGE_MARGIN))
+        y = int(rng.integers(EDGE_MARGIN, height - EDGE_MARGIN))
+        if all(np.hypot(x - cx, y - cy) >= 2 * BALL_RADIUS + BALL_GAP for cx, cy in centers):
+            centers.append((x, y))
+    return np.array(centers, dtype=np.int64).reshape(-1, 2)
+
+
+# Draws one ball; a stripe is a white ball with a colored band at the given angle
+def draw_ball(img, center, ball_type, color, angle):
+    if ball_type not in ("white", "stripe"):
+        cv.circle(img, center, BALL_RADIUS, color, -1, cv.LINE_AA)
+    else:
+        cv.circle(img, center, BALL_RADIUS, WHITE_SHADE, -1, cv.LINE_AA)
+        x, y = center
+        size = 2 * BALL_RADIUS + 1
+        disk = np.zeros((size, size), dtype=np.uint8)
+        cv.circle(disk, (BALL_RADIUS, BALL_RADIUS), BALL_RADIUS - 1, 255, -1)
+        region = img[y - BALL_RADIUS:y + BALL_RADIUS + 1, x - BALL_RADIUS:x + BALL_RADIUS + 1]
+        region[disk > 0] = shaded_white()[disk > 0]
+
+    if ball_type == "stripe":
+        # Band: rectangle through the centre, clipped to the ball
+        band = np.zeros((size, size), dtype=np.uint8)
+        dx, dy = np.cos(angle), np.sin(angle)
+        half_length, half_width = BALL_RADIUS, STRIPE_HALF_WIDTH * BALL_RADIUS
+        corners = np.array([
+            [BALL_RADIUS + sx * half_length * dx - sy * half_width * dy,
+             BALL_RADIUS + sx * half_length * dy + sy * half_width * dx]
+            for sx, sy in ((-1, -1), (1, -1), (1, 1), (-1, 1))
+        ], dtype=np.int32)
+        cv.fillPoly(band, [corners], 255)
+        region[(band > 0) & (disk > 0)] = color
+
+    # Specular highlight
+    cv.circle(img, (center[0] - BALL_RADIUS // 3, center[1] - BALL_RADIUS // 3), 3, (255, 255, 255), -1, cv.LINE_AA)
+
+
+# Square patch (2 * BALL_RADIUS + 1) of the white of a ball, WHITE_COLOR fading to WHITE_SHADE at the rim
+def shaded_white():
+    offsets = np.arange(-BALL_RADIUS, BALL_RADIUS + 1)
+    distance = np.hypot(offsets[:, None], offsets[None, :]) / BALL_RADIUS
+    fade = np.clip((distance - WHITE_FADE) / (1 - WHITE_FADE), 0, 1)[..., None]
+    return np.round(np.multiply(WHITE_COLOR, 1 - fade) + np.multiply(WHITE_SHADE, fade)).astype(np.uint8)
+
+
+# Uneven lighting: brightness falls off linearly from a random corner
+def apply_lighting(img, lighting, rng):
+    if lighting <= 0:
+        return img
+    height, width = img.shape[:2]
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    corner_x, corner_y = rng.integers(0, 2) * width, rng.integers(0, 2) * height
+    distance = np.hypot(xs - corner_x, ys - corner_y) / np.hypot(width, height)
+    gain = 1 - lighting * distance
+    return np.clip(img * gain[..., None], 0, 255).astype(np.uint8)
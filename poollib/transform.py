@@ -1,85 +1,75 @@
+import io
 import cv2 as cv
 import numpy as np
-import math
-from PIL import Image
-import pillow_heif
+
+from .instrument import progress
 
 #### Transform ####
 # img      - input image (required)
 # res_w    - output width (default 1000)
 # res_h    - output height (default 2000)
+# matrix   - perspective matrix from an earlier find_perspective (skips the pocket search)
 # returns the transformed image in BGR format ready for analysis
-def transform(img, res_w=1000, res_h=2000):
-    print("-----[Transform Photo]-----")
+def transform(img, res_w=1000, res_h=2000, matrix=None):
+    progress("-----[Transform Photo]-----")
 
     # Check if image is valid
     if img is None:
         raise Exception("[TRANSFORM] Invalid image")
-    print("[TRANSFORM] Image loaded")
-
-    height, width = img.shape[:2]
+    progress("[TRANSFORM] Image loaded")
 
-    # Rotate image if it is landscape
-    if width > height:
-        img = cv.rotate(img, cv.ROTATE_90_CLOCKWISE)
-        height, width = width, height
+    if matrix is None:
+        matrix = find_perspective(img, res_w, res_h)
+    dst = warp(img, matrix, res_w, res_h)
 
-    # Convert to grayscale and extract edges
-    gray = cv.cvtColor(img, cv.COLOR_BGR2GRAY)
-    blurred = cv.GaussianBlur(gray, (7, 7), 0)
-    edges = cv.Canny(blurred, 170, 200)
+    progress("[TRANSFORM] Image transformed successfully")
+    return dst
 
-    # Detect circles (pockets) using Hough Transform
-    circles = cv.HoughCircles(edges,
-                              cv.HOUGH_GRADIENT,
-                              dp=1.6,
-                              minDist=500,
-                              param1=30,
-                              param2=30,
-                              minRadius=70,
-                              maxRadius=100)
 
+# Pockets are searched on a copy downscaled so that its longer side has about this many pixels
+POCKET_SEARCH_SIZE = 1000
+
+# Pocket detection at full resolution (the downscaled search uses these scaled down)
+POCKET_PARAMS = {
+    "dp": 1.6,              # inverse ratio of accumulator resolution
+    "minDist": 500,         # minimum distance between pockets
+    "param1": 30,           # upper threshold for Canny edge detector
+    "param2": 30,           # accumulator threshold
+    "minRadius": 70,        # minimum pocket radius
+    "maxRadius": 100,       # maximum pocket radius
+}
+
+
+#### Find perspective ####
+# Finds the pockets in the photo and computes the matrix mapping them to the table corners
+# Pockets are located on a downscaled copy and then refined in small full resolution windows,
+# so no full resolution copy of the photo is made
+# refine - refine the pocket centres at full resolution (otherwise accurate to about 1/scale px)
+# returns the 3x3 perspective matrix (for the photo rotated to portrait, see warp)
+def find_perspective(img, res_w=1000, res_h=2000, refine=True):
+    rotation = portrait_matrix(img)
+    width, height = portrait_size(img)
+
+    # Downscaled grayscale copy, rotated like portrait() would rotate the photo
+    scale = min(1.0, POCKET_SEARCH_SIZE / max(height, width))
+    small = cv.resize(img, None, fx=scale, fy=scale, interpolation=cv.INTER_AREA) if scale < 1 else img
+    small = portrait(cv.cvtColor(small, cv.COLOR_BGR2GRAY))
+
+    circles = find_pockets(small, scale)
     if circles is None:
         raise Exception("[TRANSFORM] No pockets detected, check image")
 
-    print("[TRANSFORM] Pockets detected")
-    circles = np.uint16(np.around(circles))[0]
-
-    # Initialize variables to store circles closest to corners
-    tlCirc = {"circle": [0, 0, 0], "dist": 1e6}  # top-left
-    trCirc = {"circle": [0, 0, 0], "dist": 1e6}  # top-right
-    blCirc = {"circle": [0, 0, 0], "dist": 1e6}  # bottom-left
-    brCirc = {"circle": [0, 0, 0], "dist": 1e6}  # bottom-right
-
-    # Find circles closest to each corner
-    for (x, y, r) in circles:
-        # Top-left
-        dist = math.hypot(x, y)
-        if dist < tlCirc["dist"]:
-            tlCirc["dist"] = dist
-            tlCirc["circle"] = [x, y, r]
-        # Top-right
-        dist = math.hypot(width - x, y)
-        if dist < trCirc["dist"]:
-            trCirc["dist"] = dist
-            trCirc["circle"] = [x, y, r]
-        # Bottom-left
-        dist = math.hypot(x, height - y)
-        if dist < blCirc["dist"]:
-            blCirc["dist"] = dist
-            blCirc["circle"] = [x, y, r]
-        # Bottom-right
-        dist = math.hypot(width - x, height - y)
-        if dist < brCirc["dist"]:
-            brCirc["dist"] = dist
-            brCirc["circle"] = [x, y, r]
-
-    # Prepare points for perspective transform
+    progress("[TRANSFORM] Pockets detected")
+    circles = circles[0] / scale
+
+    # Pick the circles closest to each corner (top-left, top-right, bottom-left, bottom-right)
+    corners = np.float32([[0, 0], [width, 0], [0, height], [width, height]])
+    distances = np.hypot(*(circles[None, :, :2] - corners[:, None]).transpose(2, 0, 1))
+    pockets = circles[np.argmin(distances, axis=1)]
+
     pts1 = np.float32([
-        [tlCirc["circle"][0], tlCirc["circle"][1]],
-        [trCirc["circle"][0], trCirc["circle"][1]],
-        [blCirc["circle"][0], blCirc["circle"][1]],
-        [brCirc["circle"][0], brCirc["circle"][1]]
+        refine_pocket(img, rotation, x, y, r) if refine and scale < 1 else (x, y)
+        for x, y, r in pockets
     ])
     pts2 = np.float32([
         [0, 0],
@@ -88,32 +78,110 @@ def transform(img, res_w=1000, res_h=2000):
         [res_w, res_h]
     ])
 
-    # Compute perspective transform and apply
-    M = cv.getPerspectiveTransform(pts1, pts2)
-    dst = cv.warpPerspective(img, M, (res_w, res_h))
+    # Compute perspective transform
+    return cv.getPerspectiveTransform(pts1, pts2)
+
+
+# Hough detection of the pockets in a grayscale image
+# scale - image scale relative to the photo (pocket sizes and distances are scaled with it)
+def find_pockets(gray, scale=1.0):
+    # Blur and extract edges (a 7x7 kernel is a sigma of 1.4, scaled down with the image)
+    blurred = cv.GaussianBlur(gray, (7, 7), 0) if scale == 1 else cv.GaussianBlur(gray, (0, 0), 1.4 * scale)
+    edges = cv.Canny(blurred, 170, 200)
+
+    return cv.HoughCircles(edges,
+                           cv.HOUGH_GRADIENT,
+                           dp=POCKET_PARAMS["dp"],
+                           minDist=POCKET_PARAMS["minDist"] * scale,
+                           param1=POCKET_PARAMS["param1"],
+                           param2=POCKET_PARAMS["param2"] * scale,
+                           minRadius=int(POCKET_PARAMS["minRadius"] * scale),
+                           maxRadius=int(np.ceil(POCKET_PARAMS["maxRadius"] * scale)))
+
+
+# Detects a pocket found on the downscaled copy again in a full resolution window around it
+# x, y, r  - pocket in portrait coordinates of the photo
+# rotation - portrait_matrix() of the photo
+# returns the refined (x, y) in portrait coordinates, or (x, y) if nothing was found there
+def refine_pocket(img, rotation, x, y, r):
+    height, width = img.shape[:2]
+    half = POCKET_PARAMS["maxRadius"] + 2 * (POCKET_PARAMS["maxRadius"] - POCKET_PARAMS["minRadius"])
+
+    # Window in the (unrotated) photo
+    ox, oy = (np.linalg.inv(rotation) @ (x, y, 1))[:2]
+    x1, y1 = max(0, int(ox) - half), max(0, int(oy) - half)
+    x2, y2 = min(width, int(ox) + half + 1), min(height, int(oy) + half + 1)
+
+    window = cv.cvtColor(img[y1:y2, x1:x2], cv.COLOR_BGR2GRAY)
+    found = find_pockets(window)
+    if found is None:
+        return x, y
+
+    found = found[0, :, :2] + np.float32([x1, y1])
+    best = found[np.argmin(np.hypot(found[:, 0] - ox, found[:, 1] - oy))]
+    px, py = (rotation @ (*best, 1))[:2]
+    if np.hypot(px - x, py - y) > r:
+        return x, y
+    return px, py
 
-    print("[TRANSFORM] Image transformed successfully")
-    return dst
+
+#### Warp ####
+# Applies a perspective matrix from find_perspective to the photo
+# The portrait rotation is folded into the matrix, so the photo is resampled only once
+def warp(img, matrix, res_w=1000, res_h=2000):
+    return cv.warpPerspective(img, np.asarray(matrix) @ portrait_matrix(img), (res_w, res_h))
+
+
+# Rotate image if it is landscape
+def portrait(img):
+    height, width = img.shape[:2]
+    if width > height:
+        img = cv.rotate(img, cv.ROTATE_90_CLOCKWISE)
+    return img
+
+
+# Size (width, height) of the image after portrait()
+def portrait_size(img):
+    height, width = img.shape[:2]
+    return (height, width) if width > height else (width, height)
+
+
+# Matrix mapping image coordinates to coordinates in portrait(img)
+def portrait_matrix(img):
+    height, width = img.shape[:2]
+    if width > height:
+        # 90 degrees clockwise: (x, y) -> (height - 1 - y, x)
+        return np.float64([[0, -1, height - 1], [1, 0, 0], [0, 0, 1]])
+    return np.eye(3)
 
 
 #### HEIC to OpenCV ####
-# Converts a HEIC image to a format usable by OpenCV
-def heic2opencv(input_path):
-    # Open HEIC file
-    heif_image = pillow_heif.open_heif(input_path)
+# Converts a HEIC image (file path or encoded bytes) to a format usable by OpenCV
+# The image is decoded straight to BGR and copied once out of the decoder's buffer
+# (no intermediate PIL image, no color conversion)
+def heic2opencv(source):
+    # pillow_heif is only loaded when a HEIC image is actually decoded
+    import pillow_heif
 
-    # Convert to PIL image
-    image = Image.frombytes(
-        heif_image.mode,
-        heif_image.size,
-        heif_image.data,
-        "raw"
-    )
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
 
-    # Convert to NumPy array (RGB)
-    image_np = np.array(image)
+    # Open HEIC file, decoded to BGR (OpenCV order) by libheif
+    heif_image = pillow_heif.open_heif(source, bgr_mode=True)
 
-    # Convert RGB to BGR for OpenCV
-    image_bgr = cv.cvtColor(image_np, cv.COLOR_RGB2BGR)
+    # NumPy copy of the decoded pixels (the decoder's buffer is freed with heif_image,
+    # so a view of it must not outlive this function)
+    image_bgr = np.array(heif_image)
+    if image_bgr.shape[2] == 4:
+        image_bgr = cv.cvtColor(image_bgr, cv.COLOR_BGRA2BGR)
 
     return image_bgr
+
+
+# Major brands of HEIF files
+HEIF_BRANDS = (b"heic", b"heix", b"heim", b"heis", b"hevc", b"hevx", b"mif1", b"msf1")
+
+
+# Checks whether encoded image bytes are a HEIC/HEIF image (ISO-BMFF "ftyp" box with a HEIF brand)
+def is_heic(data):
+    return bytes(data[4:8]) == b"ftyp" and bytes(data[8:12]) in HEIF_BRANDS
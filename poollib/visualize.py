@@ -1,5 +1,12 @@
 import cv2 as cv
 import numpy as np
+from functools import lru_cache
+
+from .ShotSet import ShotSet
+from .shots_batch import shot_segments
+
+TABLE_COLOR = (200, 150, 69)  # main table color
+EDGE_COLOR = (184, 107, 69)  # table edges
 
 
 def visualize(img, balls, shots):
@@ -7,7 +14,7 @@ def visualize(img, balls, shots):
     Draws the table, balls, and calculated shots.
     img   - input image (used only for size)
     balls - list of Ball objects
-    shots - list of Shot objects
+    shots - list of Shot objects or a ShotSet
     returns an image with visualization
     """
     ball_radius = 23
@@ -15,19 +22,10 @@ def visualize(img, balls, shots):
     # Create base table visualization
     table = create_table(img)
 
-    # Draw shots
-    for shot in shots:
-        target_dir, white_dir = shot.get_lines()
-
-        # Draw lines for rebounds if exist
-        if len(target_dir) > 1:
-            cv.line(table, target_dir["y2"][0], target_dir["y2"][1], (0, 0, 255), 3)
-        if len(white_dir) > 1:
-            cv.line(table, white_dir["y2"][0], white_dir["y2"][1], (0, 0, 255), 3)
-
-        # Draw main shot lines
-        cv.line(table, white_dir["y1"][0], white_dir["y1"][1], (0, 0, 255), 3)
-        cv.line(table, target_dir["y1"][0], target_dir["y1"][1], (0, 0, 255), 3)
+    # Draw all shot lines (main lines and rebounds) with one call
+    lines = shot_lines(shots)
+    if len(lines):
+        cv.polylines(table, lines, False, (0, 0, 255), 3)
 
     # Draw balls
     for ball in balls:
@@ -54,32 +52,54 @@ def visualize(img, balls, shots):
     font_thickness = 2
 
     # Draw ghost balls and angle text
-    for shot in shots:
-        ghost = shot.get_ghost()
+    # (many shots share a ghost ball and label; everything here is one color, so each is drawn once)
+    labels = {(shot.get_ghost(), f"{round(180 - shot.get_angle(), 1)}deg") for shot in shots}
+    for ghost in {ghost for ghost, _ in labels}:
         cv.circle(table, ghost, ball_radius, (0, 255, 0), 5)
-        text = f"{round(180 - shot.get_angle(), 1)}deg"
+    for ghost, text in labels:
         cv.putText(table, text, (ghost[0] - 30, ghost[1] - 35),
                    font, font_scale, font_color, font_thickness)
 
     return table
 
 
-def create_table(img):
+def shot_lines(shots):
+    """
+    Collects the line segments of all shots for a single cv.polylines call.
+    returns an int32 array (segments, 2, 2)
+    """
+    if isinstance(shots, ShotSet):
+        segments, exists = shot_segments(shots.get_batch())
+        return np.ascontiguousarray(segments[exists], dtype=np.int32)
+
+    lines = []
+    for shot in shots:
+        target_dir, white_dir = shot.get_lines()
+        lines.extend(target_dir.values())
+        lines.extend(white_dir.values())
+    return np.array(lines, dtype=np.int32).reshape(-1, 2, 2)
+
+
+def create_table(img, table_color=TABLE_COLOR, edge_color=EDGE_COLOR):
     """
     Creates a blank table visualization.
     img - input image (used only for dimensions)
+    table_color, edge_color - BGR colors of the cloth and the edges
     returns a BGR image representing the table
     """
+    # The background only depends on the image size and colors, so it is drawn once per size
+    return table_background(img.shape, img.dtype.str, tuple(table_color), tuple(edge_color)).copy()
+
+
+@lru_cache(maxsize=4)
+def table_background(shape, dtype, table_color=TABLE_COLOR, edge_color=EDGE_COLOR):
     edge_width = 25
     corner_radius = 70
     center_radius = 50
-    height, width = img.shape[:2]
-
-    table_color = (200, 150, 69)  # main table color
-    edge_color = (184, 107, 69)  # table edges
+    height, width = shape[:2]
 
     # Create blank image
-    output = np.zeros_like(img)
+    output = np.zeros(shape, dtype=dtype)
     output[:] = table_color
 
     # Draw table edges
@@ -96,4 +116,5 @@ def create_table(img):
     cv.circle(output, (0, width), center_radius, 0, -1)  # left-middle
     cv.circle(output, (width, width), center_radius, 0, -1)  # right-middle
 
+    output.flags.writeable = False
     return output
@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import cv2 as cv
+import numpy as np
+
+from batch import analyze
+from poollib.instrument import set_verbose
+from poollib.synthetic import synthetic_table
+
+# Largest accepted request body (encoded image) in bytes
+MAX_BODY = 64 * 2 ** 20
+
+# Number of most recent requests the latency percentiles are computed from
+LATENCY_WINDOW = 1000
+
+SHOT_TYPES = ("all", "stripe", "solid", "black")
+
+
+# The LatencyStats class keeps the latencies of the last requests and request counters
+class LatencyStats:
+    def __init__(self, window=LATENCY_WINDOW):
+        self.__lock = threading.Lock()
+        self.__total = deque(maxlen=window)
+        self.__analysis = deque(maxlen=window)
+        self.__requests = 0
+        self.__failed = 0
+        self.__rejected = 0
+
+    def record(self, total, analysis, failed):
+        # total - seconds from accepting the request to the response, analysis - seconds in the worker
+        with self.__lock:
+            self.__requests += 1
+            self.__failed += failed
+            self.__total.append(total)
+            self.__analysis.append(analysis)
+
+    def reject(self):
+        with self.__lock:
+            self.__rejected += 1
+
+    def snapshot(self):
+        with self.__lock:
+            total, analysis = np.array(self.__total), np.array(self.__analysis)
+            counts = {"requests": self.__requests, "failed": self.__failed, "rejected": self.__rejected}
+        return {**counts, "window": len(total), "latency_ms": percentiles(total),
+                "analysis_ms": percentiles(analysis), "overhead_ms": percentiles(total - analysis)}
+
+
+# p50/p90/p99/max of latencies in seconds, in milliseconds
+def percentiles(seconds):
+    if len(seconds) == 0:
+        return None
+    p50, p90, p99 = np.percentile(seconds, [50, 90, 99]) * 1000
+    return {"p50": round(p50, 2), "p90": round(p90, 2), "p99": round(p99, 2),
+            "max": round(float(seconds.max()) * 1000, 2)}
+
+
+# The AnalysisService class runs analyses on a pool of warm worker processes.
+# At most workers + queue_size analyses are accepted at a time (running or waiting);
+# further requests are refused immediately instead of queueing without bound.
+# When a worker process dies the pool is broken: the requests it was serving fail with 500
+# and the pool is replaced by a new (warming up) one.
+class AnalysisService:
+    def __init__(self, workers=None, queue_size=None, timeout=30.0):
+        self.__workers = workers or os.cpu_count()
+        self.__capacity = self.__workers + (self.__workers if queue_size is None else queue_size)
+        self.__lock = threading.Lock()
+        self.__in_flight = 0
+        self.__timeout = timeout
+        self.__stats = LatencyStats()
+        self.__restarts = 0
+        self.__executor = self.__create_executor()
+
+    def start(self):
+        # Start the worker processes and wait until they are all warm (imports done, one analysis run)
+        for future in self.__warm_up(self.__executor):
+            future.result()
+
+    def close(self):
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    def analyze(self, data, shot_type="all", pyramid=False, raw=False):
+        # Analyzes encoded image bytes, returns (HTTP status, JSON-ready dict)
+        with self.__lock:
+            accepted = self.__in_flight < self.__capacity
+            self.__in_flight += accepted
+        if not accepted:
+            self.__stats.reject()
+            return 503, {"error": "Too many requests in progress, retry later"}
+
+        start = time.perf_counter()
+        executor = self.__executor
+        try:
+            future = executor.submit(analyze, data, raw, shot_type, None, pyramid)
+        except BrokenProcessPool:
+            self.__finished(None)
+            return self.__broken(executor, start)
+        except Exception:
+            self.__finished(None)
+            raise
+        # The slot is freed when the analysis ends, also if the client stopped waiting for it
+        future.add_done_callback(self.__finished)
+
+        try:
+            result = future.result(timeout=self.__timeout)
+        except TimeoutError:
+            self.__stats.record(time.perf_counter() - start, time.perf_counter() - start, True)
+            return 504, {"error": f"Analysis took longer than {self.__timeout}s"}
+        except BrokenProcessPool:
+            return self.__broken(executor, start)
+
+        failed = result["error"] is not None
+        self.__stats.record(time.perf_counter() - start, result["time"], failed)
+        result.pop("image")
+        return (422 if failed else 200), result
+
+    def stats(self):
+        return {**self.__stats.snapshot(), "workers": self.__workers, "capacity": self.__capacity,
+                "in_flight": self.__in_flight, "restarts": self.__restarts}
+
+    def __finished(self, future):
+        with self.__lock:
+            self.__in_flight -= 1
+
+    def __create_executor(self):
+        # Every worker gets the barrier its warm-up task waits on (see _warm_up)
+        barrier = multiprocessing.Barrier(self.__workers)
+        return ProcessPoolExecutor(max_workers=self.__workers, initializer=_init_worker, initargs=(barrier,))
+
+    def __warm_up(self, executor):
+        # One warm-up task per worker; none of them returns before all workers run one, so every
+        # process is started and warmed (the pool starts processes on demand)
+        return [executor.submit(_warm_up) for _ in range(self.__workers)]
+
+    def __broken(self, executor, start):
+        # A worker of executor died: replace the pool (once, other requests on it fail the same way)
+        with self.__lock:
+            replaced = self.__executor is executor
+            if replaced:
+                self.__executor = self.__create_executor()
+                self.__restarts += 1
+        if replaced:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.__warm_up(self.__executor)
+        self.__stats.record(time.perf_counter() - start, time.perf_counter() - start, True)
+        return 500, {"error": "A worker process stopped during the analysis, the worker pool was restarted"}
+
+
+# Barrier of the worker's pool, shared by its warm-up tasks
+_barrier = None
+
+
+def _init_worker(barrier):
+    global _barrier
+    _barrier = barrier
+
+    # One OpenCV thread per process, parallelism comes from the pool
+    cv.setNumThreads(1)
+    set_verbose(False)
+
+    # Warm up: load the lazily imported decoders and run every stage once
+    import pillow_heif  # noqa: F401
+    img, _ = synthetic_table(8, seed=0)
+    analyze(cv.imencode(".png", img)[1].tobytes())
+
+
+# Warm-up task: waits until every worker of the pool runs one, so each process takes exactly one
+def _warm_up():
+    _barrier.wait()
+    return os.getpid()
+
+
+# HTTP interface:
+#   POST /analyze?type=all&pyramid=0&raw=0  body: encoded image (JPG, PNG or HEIC)
+#   GET  /stats                              request counts and latency percentiles
+#   GET  /health
+class RequestHandler(BaseHTTPRequestHandler):
+    service = None
+    verbose = False
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/analyze":
+            return self.__send(404, {"error": "Not found"})
+
+        query = parse_qs(url.query)
+        shot_type = query.get("type", ["all"])[0]
+        if shot_type not in SHOT_TYPES:
+            return self.__send(400, {"error": f"Unknown shot type {shot_type}"})
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            return self.__send(400, {"error": "Image bytes expected in the request body"})
+        if length > MAX_BODY:
+            return self.__send(413, {"error": f"Image larger than {MAX_BODY} bytes"})
+        data = self.rfile.read(length)
+
+        status, result = self.service.analyze(data, shot_type, _flag(query, "pyramid"), _flag(query, "raw"))
+        self.__send(status, result)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/stats":
+            self.__send(200, self.service.stats())
+        elif path == "/health":
+            self.__send(200, {"status": "ok"})
+        else:
+            self.__send(404, {"error": "Not found"})
+
+    def __send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Request logging is terminal I/O on every request, only with --verbose
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+def _flag(query, name):
+    return query.get(name, ["0"])[0].lower() in ("1", "true", "yes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP analysis service with a warm worker pool")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--queue", type=int, help="requests that may wait for a worker (default: workers)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for one analysis")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    service = AnalysisService(args.workers, args.queue, args.timeout)
+    print(f"Starting {args.workers} workers...", file=sys.stderr)
+    service.start()
+
+    RequestHandler.service = service
+    RequestHandler.verbose = args.verbose
+    server = ThreadingHTTPServer((args.host, args.port), RequestHandler)
+    print(f"Listening on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
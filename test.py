@@ -1,64 +1,159 @@
 PICTURES_DIR = "01 - policzone przed filtrami"
 CSV_SHEET = "coole.csv"
+CHECKPOINT = "test_checkpoint.csv"
+WORKERS = None  # None = one worker per CPU
+SLOWEST = 5
+PYRAMID = False  # coarse-to-fine detection (Table.detect(pyramid=True))
 
 import os
+import io
+import sys
 import csv
+import time
+import json
 import shutil
+import subprocess
+import contextlib
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2 as cv
+
+from poollib import IMPORT_BUDGET_MS, LAZY_IMPORTS
 from poollib.Table import Table
 
-ok = 0
-output_folder_name = datetime.now().strftime("%m%d_%H%M%S")
+# Measures the import of poollib.Table in a fresh interpreter (NumPy and OpenCV loaded first)
+IMPORT_PROBE = """
+import sys, time, json
+import numpy, cv2
+start = time.perf_counter()
+import poollib.Table
+print(json.dumps({"ms": (time.perf_counter() - start) * 1000, "modules": sorted(sys.modules)}))
+"""
 
 
-def compare_output(expected_balls, photo_name):
+def compare_output(expected_balls, photo_name, output_folder_name):
     """
     Compare detected balls with expected count for a single photo.
     Copy failing photos to output folder.
+    returns (photo name, passed, wall time in seconds)
     """
-    global ok
-
+    start = time.perf_counter()
     full_path = os.path.join(PICTURES_DIR, photo_name)
-    t1 = Table(full_path)
-    t1.detect()
-    detected_count = t1.get_balls_count()
 
-    if int(detected_count) != expected_balls:
-        print(f"FAIL| {photo_name}")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            t1 = Table(full_path)
+            t1.detect(pyramid=PYRAMID)
+        detected_count = t1.get_balls_count()
+    except Exception:
+        detected_count = 0
+
+    passed = int(detected_count) == expected_balls
+    if not passed:
         shutil.copy(full_path, os.path.join(output_folder_name, photo_name))
-    else:
-        print(f"OK  | {photo_name}")
-        ok += 1
 
-    return int(detected_count) == expected_balls
+    return photo_name, passed, time.perf_counter() - start
+
+
+def check_imports():
+    """
+    Check the import-time budget documented in poollib/__init__.py.
+    returns True if importing poollib.Table is fast enough and loads no lazy dependency
+    """
+    probe = subprocess.run([sys.executable, "-c", IMPORT_PROBE], capture_output=True, text=True, check=True)
+    result = json.loads(probe.stdout)
+    loaded = [name for name in LAZY_IMPORTS if name in result["modules"]]
+
+    passed = result["ms"] <= IMPORT_BUDGET_MS and not loaded
+    print(f"{'OK  ' if passed else 'FAIL'}| import poollib.Table: {result['ms']:.1f} ms "
+          f"(budget {IMPORT_BUDGET_MS} ms){', loaded: ' + ', '.join(loaded) if loaded else ''}")
+    return passed
+
+
+def init_worker():
+    # One OpenCV thread per process, parallelism comes from the pool
+    cv.setNumThreads(1)
+
+
+def load_checkpoint():
+    """
+    Reads results of an interrupted run.
+    returns (output folder name, {photo name: (passed, seconds)}) or (None, {}) for a fresh run
+    """
+    if not os.path.exists(CHECKPOINT):
+        return None, {}
+
+    done = {}
+    with open(CHECKPOINT, newline='', encoding='utf-8') as checkpoint:
+        reader = csv.reader(checkpoint, delimiter=';')
+        output_folder_name = next(reader)[0]
+        for photo_name, passed, seconds in reader:
+            done[photo_name] = (passed == "True", float(seconds))
+    return output_folder_name, done
 
 
 def main():
+    imports_ok = check_imports()
+
     # Read CSV with expected results
     with open(CSV_SHEET, newline='', encoding='utf-8') as csvfile:
         rows = list(csv.reader(csvfile, delimiter=';', quotechar='"'))
 
-    # Create output folder
-    os.mkdir(output_folder_name)
+    # Resume an interrupted run or create a new output folder
+    output_folder_name, done = load_checkpoint()
+    if output_folder_name is None:
+        output_folder_name = datetime.now().strftime("%m%d_%H%M%S")
+        os.mkdir(output_folder_name)
+        with open(CHECKPOINT, 'w', newline='', encoding='utf-8') as checkpoint:
+            csv.writer(checkpoint, delimiter=';').writerow([output_folder_name])
+    else:
+        print(f"Resuming {output_folder_name}: {len(done)} photos already checked")
+
+    expected = {row[0]: int(row[1]) for row in rows[1:]}
+    todo = [name for name in expected if name not in done]
+
+    # Check photos in parallel, saving every finished photo to the checkpoint
+    with open(CHECKPOINT, 'a', newline='', encoding='utf-8') as checkpoint, \
+            ProcessPoolExecutor(max_workers=WORKERS, initializer=init_worker) as executor:
+        writer = csv.writer(checkpoint, delimiter=';')
+        futures = [executor.submit(compare_output, expected[name], name, output_folder_name) for name in todo]
 
-    # Compare each row
+        for future in as_completed(futures):
+            photo_name, passed, seconds = future.result()
+            done[photo_name] = (passed, seconds)
+            writer.writerow([photo_name, passed, f"{seconds:.3f}"])
+            checkpoint.flush()
+            print(f"{'OK  ' if passed else 'FAIL'}| {seconds:6.2f}s | {photo_name}")
+
+    # Add result and time columns in the original row order
     for i, row in enumerate(rows):
         if i == 0:
-            # Add new header column
-            row.append("Script output")
+            # Add new header columns
+            row.extend(["Script output", "Time [s]"])
             continue
-        expected_balls = int(row[1])
-        photo_name = row[0]
-        row.append(compare_output(expected_balls, photo_name))
+        passed, seconds = done[row[0]]
+        row.extend([passed, f"{seconds:.3f}"])
 
     # Save updated CSV in output folder
     output_csv_path = os.path.join(output_folder_name, CSV_SHEET)
     with open(output_csv_path, 'w', newline='', encoding='utf-8') as new_csv:
         writer = csv.writer(new_csv, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
         writer.writerows(rows)
+    os.remove(CHECKPOINT)
 
+    ok = sum(passed for passed, _ in done.values())
     print(f"Passed: {ok}/{len(rows) - 1}")
 
+    print("Slowest photos:")
+    for name, (passed, seconds) in sorted(done.items(), key=lambda item: -item[1][1])[:SLOWEST]:
+        print(f"  {seconds:6.2f}s | {name}")
+
+    # The photos are still checked when the import check fails, but the run fails
+    if not imports_ok:
+        print("FAIL| import poollib.Table is over its budget or loads a lazy dependency")
+        sys.exit(1)
+
 
 if __name__ == '__main__':
     main()